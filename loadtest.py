@@ -0,0 +1,140 @@
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def worker(
+    host: str,
+    port: int,
+    paths: list[str],
+    deadline: float,
+    keep_alive: bool,
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    # each worker is one client that sends its next request as soon as the
+    # previous response has been read
+    connection = None
+    i = 0
+    clock = time.perf_counter
+    while clock() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        if connection is None:
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+        headers = {} if keep_alive else {"Connection": "close"}
+        start = clock()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(f"{path}: {e!r}")
+            connection.close()
+            connection = None
+            continue
+        latencies.append(clock() - start)
+        if response.status >= 400:
+            errors.append(f"{path}: HTTP {response.status}")
+        if not keep_alive or response.will_close:
+            connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+
+
+def run_load(
+    url: str,
+    paths: list[str],
+    concurrency: int = 16,
+    duration: float = 10.0,
+    keep_alive: bool = True,
+) -> dict:
+    parsed = urllib.parse.urlsplit(url)
+    host = parsed.hostname or "localhost"
+    port = parsed.port or 80
+    prefix = parsed.path.rstrip("/")
+    paths = [f"{prefix}/{path.lstrip('/')}" for path in paths]
+
+    latencies: list[list[float]] = [[] for _ in range(concurrency)]
+    errors: list[str] = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(host, port, paths, deadline, keep_alive, latencies[i], errors),
+        )
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(latency for chunk in latencies for latency in chunk)
+    return {
+        "requests": len(all_latencies),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "seconds": elapsed,
+        "rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(all_latencies, 0.50) * 1000,
+            "p90": percentile(all_latencies, 0.90) * 1000,
+            "p99": percentile(all_latencies, 0.99) * 1000,
+            "max": (all_latencies[-1] if all_latencies else 0.0) * 1000,
+            "mean": (statistics.fmean(all_latencies) if all_latencies else 0.0)
+            * 1000,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the preview server")
+    parser.add_argument(
+        "--url", type=str, help="Server to test", default="http://localhost:8888/"
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        help="Path to request, can be repeated (default index.html)",
+        default=None,
+    )
+    parser.add_argument(
+        "--concurrency", type=int, help="Clients sending requests at once", default=16
+    )
+    parser.add_argument(
+        "--duration", type=float, help="Seconds to keep sending", default=10.0
+    )
+    parser.add_argument(
+        "--no-keep-alive",
+        action="store_true",
+        help="Open a new connection for every request",
+    )
+    args = parser.parse_args()
+
+    results = run_load(
+        args.url,
+        args.path or ["index.html"],
+        args.concurrency,
+        args.duration,
+        not args.no_keep_alive,
+    )
+    print(json.dumps(results, indent=1))
+    print(
+        f"{results['rps']:.0f} requests/s, "
+        f"p99 {results['latency_ms']['p99']:.2f} ms, {results['errors']} errors"
+    )
@@ -1,20 +1,570 @@
 import argparse
+import datetime
+import email.utils
+import functools
+import hashlib
+import io
+import json
 import os
+import queue
+import select
+import selectors
+import socket
+import stat
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 
+# written by the site generator next to the pages it builds
+MANIFEST_NAME = ".build-manifest.json"
+GZIP_SUFFIX = ".gz"
+
+
+class CachedFile:
+    def __init__(
+        self,
+        path: str,
+        data: bytes,
+        content_type: str,
+        etag: str,
+        st: os.stat_result,
+        encoding: str | None = None,
+        page_path: str | None = None,
+    ) -> None:
+        self.path = path
+        # for a precompressed sibling, the page it was compressed from
+        self.page_path = page_path
+        self.data = data
+        self.content_type = content_type
+        # Content-Encoding of data, e.g. "gzip" for a precompressed sibling
+        self.encoding = encoding
+        self.etag = etag
+        self.mtime = int(st.st_mtime)
+        self.last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        self.stat_key = _stat_key(st)
+
+    def is_current(self) -> bool:
+        # One stat per request (two for a .gz), so a file the generator has
+        # just replaced is never served from the cache. A .gz that is older
+        # than its page is stale too, the page is served until it is redone.
+        try:
+            st = os.stat(self.path)
+            if _stat_key(st) != self.stat_key:
+                return False
+            if self.page_path is not None:
+                return os.stat(self.page_path).st_mtime_ns <= st.st_mtime_ns
+        except OSError:
+            return False
+        return True
+
+
+def _stat_key(st: os.stat_result) -> tuple[int, int, int]:
+    # the generator replaces pages with a rename, which also changes the inode
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def precompressed(path: str) -> str | None:
+    # The .gz sibling of the page at path, when there is one that is at least
+    # as new as the page; an older one was left by a previous build.
+    gzip_path = path + GZIP_SUFFIX
+    try:
+        page_mtime = os.stat(path).st_mtime_ns
+        st = os.stat(gzip_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_mtime_ns < page_mtime:
+        return None
+    return gzip_path
+
+
+class FileCache:
+    # LRU cache of file contents keyed by request path, capped at max_bytes.
+    # A cached file is re-stat-ed on every lookup and dropped once the
+    # generator (or anything else) has replaced it.
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 64 << 20,
+        max_file_bytes: int = 4 << 20,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.entries: OrderedDict[str, CachedFile] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # output path relative to root -> sha256 recorded by the last build
+        self.manifest: dict[str, str] = {}
+        self.manifest_key: tuple[int, int, int] | None = None
+
+    def lookup(self, key: str) -> CachedFile | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+        if not entry.is_current():
+            with self.lock:
+                self.misses += 1
+                self._drop(key, entry)
+            return None
+        with self.lock:
+            self.hits += 1
+        return entry
+
+    def load(
+        self,
+        key: str,
+        path: str,
+        content_type: str,
+        encoding: str | None = None,
+        page_path: str | None = None,
+    ) -> CachedFile:
+        with open(path, "rb") as file:
+            data = file.read()
+            st = os.fstat(file.fileno())
+        etag = self.etag(path, data, st)
+        entry = CachedFile(path, data, content_type, etag, st, encoding, page_path)
+        if len(data) > self.max_file_bytes:
+            return entry
+        with self.lock:
+            old = self.entries.get(key)
+            if old is not None:
+                self._drop(key, old)
+            self.entries[key] = entry
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                oldest_key, oldest = next(iter(self.entries.items()))
+                self._drop(oldest_key, oldest)
+        return entry
+
+    def _drop(self, key: str, entry: CachedFile) -> None:
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+            self.size -= len(entry.data)
+
+    def etag(self, path: str, data: bytes, st: os.stat_result) -> str:
+        # Strong validator: the sha256 of the content. Pages the generator
+        # wrote have it in the build manifest already; it is only trusted
+        # when the manifest was saved after the file was last written.
+        relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+        digest = self.manifest_hashes(st.st_mtime_ns).get(relative)
+        if digest is None:
+            digest = hashlib.sha256(data).hexdigest()
+        return f'"{digest}"'
+
+    def manifest_hashes(self, written_ns: int) -> dict[str, str]:
+        # only called when a file is loaded; the stat is all it costs unless
+        # a build saved a new manifest
+        with self.lock:
+            self._reload_manifest()
+            if self.manifest_key is None or self.manifest_key[1] < written_ns:
+                return {}
+            return self.manifest
+
+    def _reload_manifest(self) -> None:
+        path = os.path.join(self.root, MANIFEST_NAME)
+        try:
+            key = _stat_key(os.stat(path))
+            if key == self.manifest_key:
+                return
+            with open(path, "r") as manifest_file:
+                pages = json.load(manifest_file)["pages"]
+            self.manifest = {
+                page: record["output"]
+                for page, record in pages.items()
+                if "output" in record
+            }
+            self.manifest_key = key
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.manifest = {}
+            self.manifest_key = None
+
+
+class PooledHTTPServer(HTTPServer):
+    # Hands each request to a fixed pool of worker threads. Between requests
+    # a connection waits in a selector on the idle thread instead, so a
+    # worker is only taken while a request is read, handled and answered,
+    # and idle keep-alive clients can't starve the others. Once every worker
+    # is busy, readable connections wait for the next free one.
+    quiet = False
+    file_cache: FileCache | None = None
+    # seconds a connection may wait for its next request before it is closed
+    idle_timeout = 15
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        threads: int = 32,
+        backlog: int = 128,
+    ) -> None:
+        self.request_queue_size = backlog
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="http"
+        )
+        self.slots = threading.BoundedSemaphore(threads)
+        super().__init__(server_address, handler_class)
+
+        self.closing = False
+        self.idle = selectors.DefaultSelector()
+        # connections handed to the idle thread, which owns the selector
+        self.parked: queue.SimpleQueue = queue.SimpleQueue()
+        self.wakeup, self.waker = socket.socketpair()
+        self.waker.setblocking(False)
+        self.idle.register(self.wakeup, selectors.EVENT_READ)
+        self.idle_thread = threading.Thread(
+            target=self.serve_idle, name="http-idle", daemon=True
+        )
+        self.idle_thread.start()
+
+    def process_request(self, request, client_address) -> None:
+        # a new connection waits for its first request like an idle one
+        self.park(request, client_address)
+
+    def park(self, request, client_address) -> None:
+        self.parked.put((request, client_address))
+        try:
+            self.waker.send(b"\0")
+        except (BlockingIOError, OSError):
+            # a wakeup is already pending, or the server is closing
+            pass
+
+    def serve_idle(self) -> None:
+        # socket -> (client address, time it is closed unless it sends)
+        waiting: OrderedDict = OrderedDict()
+        while True:
+            timeout = None
+            if waiting:
+                _, deadline = next(iter(waiting.values()))
+                timeout = max(0.0, deadline - time.monotonic())
+            for key, _ in self.idle.select(timeout):
+                if key.fileobj is self.wakeup:
+                    self.wakeup.recv(4096)
+                    if self.closing:
+                        self.close_idle(waiting)
+                        return
+                    deadline = time.monotonic() + self.idle_timeout
+                    while not self.parked.empty():
+                        request, client_address = self.parked.get()
+                        self.idle.register(request, selectors.EVENT_READ)
+                        waiting[request] = (client_address, deadline)
+                    continue
+                request = key.fileobj
+                self.idle.unregister(request)
+                client_address, _ = waiting.pop(request)
+                self.dispatch(request, client_address)
+            # every connection waits idle_timeout, so the oldest expire first
+            now = time.monotonic()
+            while waiting:
+                request, (_, deadline) = next(iter(waiting.items()))
+                if deadline > now:
+                    break
+                del waiting[request]
+                self.idle.unregister(request)
+                self.shutdown_request(request)
+
+    def close_idle(self, waiting: OrderedDict) -> None:
+        for request in waiting:
+            self.idle.unregister(request)
+            self.shutdown_request(request)
+        waiting.clear()
+        while not self.parked.empty():
+            self.shutdown_request(self.parked.get()[0])
+
+    def dispatch(self, request, client_address) -> None:
+        self.slots.acquire()
+        try:
+            self.executor.submit(self.process_request_thread, request, client_address)
+        except RuntimeError:
+            # the pool was shut down while this connection was waiting
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def process_request_thread(self, request, client_address) -> None:
+        keep_alive = False
+        try:
+            handler = self.finish_request(request, client_address)
+            keep_alive = getattr(handler, "keep_alive", False)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.slots.release()
+            if keep_alive and not self.closing:
+                self.park(request, client_address)
+            else:
+                self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        self.closing = True
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        # the idle thread closes whatever is still waiting
+        try:
+            self.waker.send(b"\0")
+        except OSError:
+            pass
+        self.idle_thread.join()
+        self.close_idle(OrderedDict())
+        self.idle.close()
+        self.wakeup.close()
+        self.waker.close()
+
+
+class StaticHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests. timeout bounds how
+    # long a request that has started arriving may take to be read.
+    protocol_version = "HTTP/1.1"
+    timeout = 15
+    # set when the connection stays open for another request
+    keep_alive = False
+    # seconds a worker waits for a kept-alive client's next request before
+    # handing the connection to the idle thread
+    linger = 0.002
+    # headers and body go out in separate sends; with Nagle on, the body of
+    # a kept-alive connection waits for the client's delayed ack
+    disable_nagle_algorithm = True
+
+    def handle(self) -> None:
+        # Under PooledHTTPServer a handler answers what the client has sent
+        # so far and then gives the connection back to wait for the next
+        # request without holding this worker.
+        if not hasattr(self.server, "park"):
+            super().handle()
+            return
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self.request_buffered():
+                self.keep_alive = True
+                return
+            self.handle_one_request()
+
+    def request_buffered(self) -> bool:
+        # A pipelined request already read into rfile has to be answered by
+        # this handler; rfile and its buffer go away when it finishes. A
+        # client that sends its next request right away is answered without
+        # the round trip through the idle thread, for at most linger seconds.
+        self.connection.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+        readable, _, _ = select.select([self.connection], [], [], self.linger)
+        return bool(readable)
+
+    def copyfile(self, source, outputfile) -> None:
+        # regular files go straight from the page cache to the socket
+        try:
+            source.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            super().copyfile(source, outputfile)
+            return
+        outputfile.flush()
+        self.connection.sendfile(source)
+
+    def do_GET(self) -> None:
+        if not self.send_cached(head=False):
+            super().do_GET()
+
+    def do_HEAD(self) -> None:
+        if not self.send_cached(head=True):
+            super().do_HEAD()
+
+    def send_cached(self, head: bool) -> bool:
+        # Answers from the file cache; returns False for anything it doesn't
+        # handle (directory redirects and listings, missing or big files),
+        # which is left to send_head.
+        cache = self.server.file_cache
+        if cache is None:
+            return False
+        entry = None
+        if self.accepts_gzip():
+            entry = self.cached_file(cache, gzip=True)
+        if entry is None:
+            entry = self.cached_file(cache, gzip=False)
+        if entry is None:
+            return False
+
+        if self.not_modified(entry.etag, entry.mtime):
+            self.send_response(304)
+            self.send_header("ETag", entry.etag)
+            self.send_header("Last-Modified", entry.last_modified)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return True
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        if entry.encoding is not None:
+            self.send_header("Content-Encoding", entry.encoding)
+        self.send_header("Content-Length", str(len(entry.data)))
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        # the browser keeps its copy but checks the ETag before using it
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(entry.data)
+        return True
+
+    def cached_file(self, cache: FileCache, gzip: bool) -> CachedFile | None:
+        # The page itself, or with gzip its precompressed sibling. Cached
+        # under the request path; "gzip:" can't clash with a path, which
+        # starts with "/".
+        key = urllib.parse.urlsplit(self.path).path
+        cache_key = f"gzip:{key}" if gzip else key
+        entry = cache.lookup(cache_key)
+        if entry is not None:
+            return entry
+
+        path = self.translate_path(self.path)
+        if key.endswith("/"):
+            path = os.path.join(path, "index.html")
+        content_type = self.guess_type(path)
+        page_path = None
+        if gzip:
+            page_path = path
+            path = precompressed(path)
+            if path is None:
+                return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode) or st.st_size > cache.max_file_bytes:
+            return None
+        encoding = "gzip" if gzip else None
+        return cache.load(cache_key, path, content_type, encoding, page_path)
+
+    def send_head(self):
+        # SimpleHTTPRequestHandler.send_head for regular files that aren't
+        # cached, which also serves the precompressed sibling. Directory
+        # redirects, listings and errors are still left to it.
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not urllib.parse.urlsplit(self.path).path.endswith("/"):
+                return super().send_head()
+            if not os.path.isfile(index):
+                return super().send_head()
+            path = index
+        file_path = path
+        encoding = None
+        if self.accepts_gzip():
+            gzip_path = precompressed(path)
+            if gzip_path is not None:
+                file_path, encoding = gzip_path, "gzip"
+        try:
+            source = open(file_path, "rb")
+        except OSError:
+            return super().send_head()
+        try:
+            st = os.fstat(source.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                source.close()
+                return super().send_head()
+            last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+            if self.not_modified(None, int(st.st_mtime)):
+                source.close()
+                self.send_response(304)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return None
+            self.send_response(200)
+            self.send_header("Content-Type", self.guess_type(path))
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(st.st_size))
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return source
+        except BaseException:
+            source.close()
+            raise
+
+    def accepts_gzip(self) -> bool:
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.partition(";")
+            if name.strip().lower() not in ("gzip", "*"):
+                continue
+            # "gzip;q=0" means the client refuses it
+            for param in params.split(";"):
+                name, _, value = param.strip().partition("=")
+                if name == "q":
+                    try:
+                        return float(value) > 0
+                    except ValueError:
+                        return False
+            return True
+        return False
+
+    def not_modified(self, etag: str | None, mtime: int) -> bool:
+        # etag is None for a file served without one, which then never
+        # matches If-None-Match
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-Modified-Since is ignored when If-None-Match is present, and
+            # If-None-Match uses the weak comparison
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or (etag is not None and etag in tags)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return mtime <= since.timestamp()
+
+    def log_message(self, format, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
 
 def run(
-    server_class=HTTPServer,
-    handler_class=SimpleHTTPRequestHandler,
+    server_class=PooledHTTPServer,
+    handler_class=StaticHandler,
     port=8888,
     directory=None,
+    threads=32,
+    backlog=128,
+    quiet=False,
+    cache_bytes=64 << 20,
 ):
-    if directory:  # Change the current working directory if directory is specified
-        os.chdir(directory)
+    directory = directory or os.getcwd()
+    handler = functools.partial(handler_class, directory=directory)
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
-    print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
-    httpd.serve_forever()
+    httpd = server_class(server_address, handler, threads, backlog)
+    httpd.quiet = quiet
+    if cache_bytes > 0:
+        httpd.file_cache = FileCache(directory, cache_bytes)
+    print(
+        f"Serving HTTP on http://localhost:{port} from directory '{directory}' "
+        f"with {threads} threads..."
+    )
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
 
 
 if __name__ == "__main__":
@@ -23,6 +573,34 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Connections served at once; more wait in the listen backlog",
+        default=32,
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        help="Connections the kernel queues while every thread is busy",
+        default=128,
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Don't log every request"
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        help="Megabytes of files kept in memory, 0 to read every request from disk",
+        default=64,
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    run(
+        port=args.port,
+        directory=args.dir,
+        threads=args.threads,
+        backlog=args.backlog,
+        quiet=args.quiet,
+        cache_bytes=args.cache_mb << 20,
+    )
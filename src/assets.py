@@ -0,0 +1,127 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from output import tmp_path_for
+
+# (source path, path relative to the asset root, size, mtime_ns)
+Asset = tuple[str, str, int, int]
+
+
+class CopyStats:
+    def __init__(self) -> None:
+        self.copied = 0
+        self.copied_bytes = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+
+    def __repr__(self):
+        return f"CopyStats({self.summary()})"
+
+    def summary(self) -> str:
+        return (
+            f"{self.copied} copied ({self.copied_bytes} bytes), "
+            f"{self.skipped} unchanged ({self.skipped_bytes} bytes)"
+        )
+
+
+def scan_assets(root: str) -> list[Asset]:
+    assets = []
+    _scan(root, "", assets)
+    return assets
+
+
+def _scan(dir_path: str, relative: str, assets: list[Asset]) -> None:
+    # scandir hands back the file type with each entry, so only regular
+    # files cost a stat
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            entry_relative = f"{relative}{entry.name}"
+            if entry.is_dir():
+                _scan(entry.path, f"{entry_relative}/", assets)
+            elif entry.is_file():
+                stat = entry.stat()
+                assets.append(
+                    (entry.path, entry_relative, stat.st_size, stat.st_mtime_ns)
+                )
+
+
+def is_current(dest_path: str, size: int, mtime_ns: int) -> bool:
+    # copies keep the source's mtime, so an untouched asset matches exactly
+    try:
+        stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+
+def copy_asset(src_path: str, dest_path: str) -> None:
+    # Copies through a temp file and a rename, so the server never sends a
+    # half-copied asset, and keeps the source's mtime for is_current.
+    tmp_path = tmp_path_for(dest_path)
+    try:
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as dest:
+            if not _copy_file_range(src, dest):
+                shutil.copyfileobj(src, dest, 1 << 20)
+        shutil.copystat(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _copy_file_range(src, dest) -> bool:
+    # The kernel copies the data without it passing through Python, and
+    # filesystems that support it (btrfs, xfs, nfs) share the blocks instead.
+    # Returns False when that isn't available, e.g. across filesystems.
+    if not hasattr(os, "copy_file_range"):
+        return False
+    src_fd = src.fileno()
+    dest_fd = dest.fileno()
+    size = os.fstat(src_fd).st_size
+    copied = 0
+    try:
+        while copied < size:
+            count = os.copy_file_range(src_fd, dest_fd, size - copied)
+            if count == 0:
+                # some filesystems (procfs-like and FUSE sources, some
+                # cross-filesystem kernels) report 0 without copying anything
+                break
+            copied += count
+    except OSError:
+        copied = -1
+    if copied != size:
+        # start over with a plain copy
+        src.seek(0)
+        dest.seek(0)
+        dest.truncate()
+        return False
+    return True
+
+
+def sync_assets(src_dir: str, dest_dir: str, threads: int = 4) -> CopyStats:
+    stats = CopyStats()
+    to_copy = []
+    made_dirs = set()
+    for src_path, relative, size, mtime_ns in scan_assets(src_dir):
+        dest_path = os.path.join(dest_dir, relative)
+        if is_current(dest_path, size, mtime_ns):
+            stats.skipped += 1
+            stats.skipped_bytes += size
+            continue
+        dest_parent = os.path.dirname(dest_path)
+        if dest_parent not in made_dirs:
+            os.makedirs(dest_parent, exist_ok=True)
+            made_dirs.add(dest_parent)
+        to_copy.append((src_path, dest_path))
+        stats.copied += 1
+        stats.copied_bytes += size
+
+    if to_copy:
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            # consuming the results re-raises the first failed copy
+            list(executor.map(lambda paths: copy_asset(*paths), to_copy))
+    return stats
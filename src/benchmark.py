@@ -0,0 +1,355 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import main
+from htmlnode import ParentNode
+from inline_markdown import (
+    extract_markdown_images,
+    extract_markdown_links,
+    split_nodes_image_link,
+    text_to_textnodes,
+)
+from markdown_blocks import (
+    block_to_block_type,
+    block_to_html_node,
+    block_type_code,
+    block_type_heading,
+    block_type_ordered_list,
+    block_type_paragraph,
+    block_type_quote,
+    block_type_unordered_list,
+    markdown_to_blocks,
+)
+from textnode import TextNode, text_type_text
+
+STAGES = (
+    "read",
+    "markdown_to_blocks",
+    "block_to_block_type",
+    "text_to_textnodes",
+    "extract_links",
+    "split_nodes_image_link",
+    "block_to_html_node",
+    "to_html",
+    "write",
+)
+
+DEFAULT_BLOCK_MIX = {
+    block_type_paragraph: 6,
+    block_type_heading: 2,
+    block_type_unordered_list: 2,
+    block_type_ordered_list: 1,
+    block_type_quote: 1,
+    block_type_code: 1,
+}
+
+_words = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+
+class CorpusGenerator:
+    def __init__(
+        self,
+        seed: int = 0,
+        block_mix: dict[str, int] | None = None,
+        blocks_per_page: int = 30,
+        list_length: int = 5,
+        inline_density: float = 0.1,
+        link_density: float = 0.0,
+    ) -> None:
+        self.random = random.Random(seed)
+        mix = block_mix if block_mix is not None else DEFAULT_BLOCK_MIX
+        self.block_types = list(mix)
+        self.block_weights = [mix[block_type] for block_type in self.block_types]
+        self.blocks_per_page = blocks_per_page
+        self.list_length = list_length
+        self.inline_density = inline_density
+        # extra chance that an otherwise plain word is a link or image
+        self.link_density = link_density
+
+    def words(self, count: int) -> str:
+        return " ".join(self.random.choice(_words) for _ in range(count))
+
+    def inline_text(self, count: int) -> str:
+        parts = []
+        for _ in range(count):
+            word = self.random.choice(_words)
+            if self.random.random() < self.inline_density:
+                markup = self.random.randrange(5)
+                if markup == 0:
+                    word = f"**{word}**"
+                elif markup == 1:
+                    word = f"*{word}*"
+                elif markup == 2:
+                    word = f"`{word}`"
+                elif markup == 3:
+                    word = f"[{word}](https://example.com/{word})"
+                else:
+                    word = f"![{word}](/images/{word}.png)"
+            elif self.link_density and self.random.random() < self.link_density:
+                if self.random.randrange(4):
+                    word = f"[{word}](https://example.com/{word})"
+                else:
+                    word = f"![{word}](/images/{word}.png)"
+            parts.append(word)
+        return " ".join(parts)
+
+    def block(self, block_type: str) -> str:
+        rand = self.random
+        if block_type == block_type_heading:
+            return f"{'#' * rand.randint(2, 4)} {self.inline_text(rand.randint(2, 6))}"
+        if block_type == block_type_code:
+            lines = [self.words(rand.randint(2, 6)) for _ in range(rand.randint(2, 8))]
+            return "```\n" + "\n".join(lines) + "\n```"
+        if block_type == block_type_quote:
+            lines = [self.inline_text(rand.randint(5, 15)) for _ in range(3)]
+            return "\n".join(f"> {line}" for line in lines)
+        if block_type == block_type_unordered_list:
+            items = [self.list_item() for _ in range(self.list_length)]
+            return "\n".join(f"- {item}" for item in items)
+        if block_type == block_type_ordered_list:
+            items = [self.list_item() for _ in range(self.list_length)]
+            return "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
+        line_count = rand.randint(1, 4)
+        lines = [self.inline_text(rand.randint(8, 20)) for _ in range(line_count)]
+        return "\n".join(lines)
+
+    def list_item(self) -> str:
+        return self.inline_text(self.random.randint(3, 12))
+
+    def page(self, number: int) -> str:
+        block_types = self.random.choices(
+            self.block_types, self.block_weights, k=self.blocks_per_page
+        )
+        blocks = [f"# Page {number} {self.words(3)}"]
+        blocks.extend(self.block(block_type) for block_type in block_types)
+        return "\n\n".join(blocks) + "\n"
+
+    def write(self, content_dir: str, pages: int, pages_per_dir: int = 50) -> list[str]:
+        paths = []
+        for number in range(pages):
+            section = os.path.join(content_dir, f"section{number // pages_per_dir}")
+            os.makedirs(section, exist_ok=True)
+            path = os.path.join(section, f"page{number}.md")
+            with open(path, "w") as page_file:
+                page_file.write(self.page(number))
+            paths.append(path)
+        return paths
+
+
+def time_stages(paths: list[str], out_dir: str) -> dict[str, float]:
+    timings = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    for i, path in enumerate(paths):
+        start = clock()
+        with open(path, "r") as page_file:
+            markdown = page_file.read()
+        timings["read"] += clock() - start
+
+        start = clock()
+        blocks = markdown_to_blocks(markdown)
+        timings["markdown_to_blocks"] += clock() - start
+
+        start = clock()
+        for block in blocks:
+            block_to_block_type(block)
+        timings["block_to_block_type"] += clock() - start
+
+        start = clock()
+        for block in blocks:
+            for line in block.splitlines():
+                text_to_textnodes(line)
+        timings["text_to_textnodes"] += clock() - start
+
+        # the image and link helpers on their own, line by line like the
+        # stage above; --link-density gives them more to find
+        start = clock()
+        for block in blocks:
+            for line in block.splitlines():
+                extract_markdown_images(line)
+                extract_markdown_links(line)
+        timings["extract_links"] += clock() - start
+
+        start = clock()
+        for block in blocks:
+            for line in block.splitlines():
+                split_nodes_image_link([TextNode(line, text_type_text)])
+        timings["split_nodes_image_link"] += clock() - start
+
+        start = clock()
+        node = ParentNode("div", [block_to_html_node(block) for block in blocks])
+        timings["block_to_html_node"] += clock() - start
+
+        start = clock()
+        html = node.to_html()
+        timings["to_html"] += clock() - start
+
+        start = clock()
+        with open(os.path.join(out_dir, f"{i}.html"), "w") as out_file:
+            out_file.write(html)
+        timings["write"] += clock() - start
+    return timings
+
+
+def time_build(content_dir: str, template_path: str, out_dir: str, jobs: int) -> float:
+    shutil.rmtree(out_dir, ignore_errors=True)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.generate_pages_recursive(content_dir, template_path, out_dir, jobs)
+    return time.perf_counter() - start
+
+
+def run_benchmark(
+    pages: int = 200,
+    seed: int = 0,
+    block_mix: dict[str, int] | None = None,
+    blocks_per_page: int = 30,
+    list_length: int = 5,
+    inline_density: float = 0.1,
+    repeat: int = 5,
+    jobs: int = 1,
+    link_density: float = 0.0,
+) -> dict:
+    config = {
+        "pages": pages,
+        "seed": seed,
+        "block_mix": block_mix if block_mix is not None else DEFAULT_BLOCK_MIX,
+        "blocks_per_page": blocks_per_page,
+        "list_length": list_length,
+        "inline_density": inline_density,
+        "link_density": link_density,
+        "repeat": repeat,
+        "jobs": jobs,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        out_dir = os.path.join(tmp, "stages")
+        os.makedirs(out_dir)
+        generator = CorpusGenerator(
+            seed, block_mix, blocks_per_page, list_length, inline_density, link_density
+        )
+        paths = generator.write(content_dir, pages)
+        corpus_bytes = sum(os.path.getsize(path) for path in paths)
+
+        template_path = os.path.join(tmp, "template.html")
+        with open(template_path, "w") as template_file:
+            template_file.write("<title>{{ Title }}</title>\n{{ Content }}\n")
+
+        runs = {stage: [] for stage in STAGES}
+        runs["build"] = []
+        for _ in range(repeat):
+            for stage, seconds in time_stages(paths, out_dir).items():
+                runs[stage].append(seconds)
+            build_dir = os.path.join(tmp, "public")
+            seconds = time_build(content_dir, template_path, build_dir, jobs)
+            runs["build"].append(seconds)
+
+    results = {}
+    for stage, seconds in runs.items():
+        results[stage] = {
+            "min": min(seconds),
+            "median": statistics.median(seconds),
+            "max": max(seconds),
+        }
+    return {
+        "python": platform.python_version(),
+        "config": config,
+        "corpus_bytes": corpus_bytes,
+        "stages": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    lines = [f"{'stage':<20} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for stage, result in current["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        before = baseline["stages"][stage]["min"]
+        after = result["min"]
+        change = (after - before) / before * 100 if before else 0.0
+        lines.append(f"{stage:<20} {before:>10.4f} {after:>10.4f} {change:>+7.1f}%")
+    return lines
+
+
+def parse_block_mix(text: str) -> dict[str, int]:
+    # "paragraph=6,heading=2" -> {"paragraph": 6, "heading": 2}
+    mix = {}
+    for item in text.split(","):
+        block_type, weight = item.split("=")
+        block_type = block_type.strip().replace("_", " ")
+        if block_type not in DEFAULT_BLOCK_MIX:
+            raise ValueError(f"unknown block type in block mix: {block_type}")
+        mix[block_type] = int(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build benchmark")
+    parser.add_argument("--pages", type=int, help="Pages in the corpus", default=200)
+    parser.add_argument("--seed", type=int, help="Corpus random seed", default=0)
+    parser.add_argument(
+        "--block-mix",
+        type=parse_block_mix,
+        help="Block type weights, e.g. paragraph=6,heading=2,unordered_list=2",
+        default=None,
+    )
+    parser.add_argument(
+        "--blocks-per-page", type=int, help="Blocks on each page", default=30
+    )
+    parser.add_argument(
+        "--list-length", type=int, help="Items in each list block", default=5
+    )
+    parser.add_argument(
+        "--inline-density",
+        type=float,
+        help="Chance that a word carries inline markup",
+        default=0.1,
+    )
+    parser.add_argument(
+        "--link-density",
+        type=float,
+        help="Extra chance that a plain word is a link or image",
+        default=0.0,
+    )
+    parser.add_argument("--repeat", type=int, help="Timed runs per stage", default=5)
+    parser.add_argument(
+        "--jobs", type=int, help="Workers for the full build", default=1
+    )
+    parser.add_argument("--output", type=str, help="Write JSON results to this file")
+    parser.add_argument(
+        "--compare", type=str, help="Compare against a previous JSON results file"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.pages,
+        args.seed,
+        args.block_mix,
+        args.blocks_per_page,
+        args.list_length,
+        args.inline_density,
+        args.repeat,
+        args.jobs,
+        args.link_density,
+    )
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        print(json.dumps(results, indent=1))
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        print("\n".join(compare(baseline, results)))
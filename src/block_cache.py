@@ -0,0 +1,30 @@
+import hashlib
+
+from render_cache import RenderCache
+
+BLOCK_CACHE_NAME = ".block-cache.json"
+
+# the cache markdown_to_html_node uses in this process, None when it is off
+_active = None
+
+
+class BlockCache(RenderCache):
+    # hash of a block's type and markdown -> the block's rendered html
+    label = "block cache"
+
+
+def block_key(block_type: str, block: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(block_type.encode())
+    digest.update(b"\0")
+    digest.update(block.encode())
+    return digest.hexdigest()
+
+
+def install_cache(cache: BlockCache | None) -> None:
+    global _active
+    _active = cache
+
+
+def active_cache() -> BlockCache | None:
+    return _active
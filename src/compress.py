@@ -0,0 +1,45 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from output import WRITTEN, write_output
+
+GZIP_SUFFIX = ".gz"
+
+
+def gzip_path(path: str) -> str:
+    return path + GZIP_SUFFIX
+
+
+def gzip_file(path: str, level: int = 6) -> str:
+    # mtime=0 keeps the archive a pure function of the page, so an unchanged
+    # page gives byte-identical .gz output that write_output leaves alone
+    with open(path, "rb") as file:
+        data = gzip.compress(file.read(), compresslevel=level, mtime=0)
+    status, _ = write_output(gzip_path(path), data)
+    return status
+
+
+def compress_outputs(paths: list[str], level: int = 6, threads: int = 0) -> int:
+    # zlib releases the GIL while it compresses, so a thread pool keeps every
+    # core busy without shipping pages to other processes. Returns the number
+    # of .gz files written.
+    if not paths:
+        return 0
+    threads = threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+        statuses = executor.map(lambda path: gzip_file(path, level), paths)
+        return sum(status == WRITTEN for status in statuses)
+
+
+def remove_gzip(paths: list[str]) -> int:
+    # drops the .gz siblings of pages written without compression, which
+    # would otherwise be served in place of the new page
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(gzip_path(path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
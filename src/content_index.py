@@ -0,0 +1,88 @@
+import os
+
+
+class SourcePage:
+    __slots__ = ("source", "key", "dest_path", "size", "mtime_ns")
+
+    def __init__(
+        self, source: str, key: str, dest_path: str, size: int, mtime_ns: int
+    ) -> None:
+        self.source = source
+        # output path relative to the build dir, as the manifest stores it
+        self.key = key
+        self.dest_path = dest_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __repr__(self):
+        return f"SourcePage({self.source} -> {self.key}, {self.size} bytes)"
+
+
+class ContentIndex:
+    # Every markdown source under content_dir with its stat and the page it
+    # renders to, found in one scandir pass. The build, its incremental check
+    # and watch mode all read this instead of walking the tree again.
+    def __init__(self, content_dir: str, dest_dir: str) -> None:
+        self.content_dir = os.path.normpath(content_dir)
+        self.dest_dir = os.path.normpath(dest_dir)
+        # source path -> page, in directory order
+        self.pages: dict[str, SourcePage] = {}
+
+    def __repr__(self):
+        return f"ContentIndex({self.content_dir}, {len(self.pages)} pages)"
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __iter__(self):
+        return iter(self.pages.values())
+
+    @classmethod
+    def scan(cls, content_dir: str, dest_dir: str) -> "ContentIndex":
+        index = cls(content_dir, dest_dir)
+        if not os.path.isdir(index.content_dir):
+            raise Exception(f"the path {content_dir} does not exist")
+        index._walk(index.content_dir, "")
+        return index
+
+    def _walk(self, dir_path: str, prefix: str) -> None:
+        # scandir hands back the file type with each entry, so only the
+        # markdown files cost a stat
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir():
+                    self._walk(entry.path, f"{prefix}{name}/")
+                elif name.endswith(".md") and entry.is_file():
+                    stat = entry.stat()
+                    self._add(entry.path, f"{prefix}{name[:-3]}.html", stat)
+
+    def _add(self, source: str, key: str, stat: os.stat_result) -> None:
+        dest_path = os.path.join(self.dest_dir, key)
+        self.pages[source] = SourcePage(
+            source, key, dest_path, stat.st_size, stat.st_mtime_ns
+        )
+
+    def page_paths(self) -> list[tuple[str, str]]:
+        return [(page.source, page.dest_path) for page in self.pages.values()]
+
+    def update(self, changed: set[str]) -> bool:
+        # Applies the paths a watcher reported instead of rescanning the
+        # tree. Returns whether any page was added, changed or removed.
+        updated = False
+        for path in changed:
+            path = os.path.normpath(path)
+            if not path.endswith(".md"):
+                continue
+            relative = os.path.relpath(path, self.content_dir)
+            if relative.split(os.sep, 1)[0] == os.pardir:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                updated |= self.pages.pop(path, None) is not None
+                continue
+            key = relative.replace(os.sep, "/")
+            self._add(path, f"{key[:-3]}.html", stat)
+            updated = True
+        return updated
@@ -0,0 +1,65 @@
+import os
+import posixpath
+import urllib.parse
+
+from manifest import BuildManifest
+
+
+def local_asset_path(url: str, static_dir: str, page_dir: str) -> str | None:
+    # Maps an image url on a page to the file in static_dir it is copied
+    # from. page_dir is the page's directory in the site, e.g. "blog", which
+    # relative urls are resolved against. None for urls on other sites.
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    site_path = posixpath.normpath(posixpath.join("/", page_dir, parts.path))
+    return os.path.normpath(os.path.join(static_dir, site_path.lstrip("/")))
+
+
+def page_dependencies(
+    images: list[str], template_path: str, static_dir: str | None, page_dir: str
+) -> list[str]:
+    # every input of a page other than its own source; images are the urls
+    # of the page's images, which rendering it collected
+    deps = [os.path.normpath(template_path)]
+    if static_dir is None:
+        return deps
+    for url in images:
+        path = local_asset_path(url, static_dir, page_dir)
+        if path is not None and path not in deps:
+            deps.append(path)
+    return deps
+
+
+def rebuild_reason(
+    key: str,
+    record: dict,
+    old_manifest: BuildManifest,
+    manifest: BuildManifest,
+    dest_path: str,
+) -> str | None:
+    # Why the page at key has to be rebuilt, or None when nothing it was
+    # built from changed and its output is still there.
+    if not manifest.compatible_with(old_manifest):
+        if old_manifest.generator_version == "":
+            return "no previous build"
+        return "generator version changed"
+    old = old_manifest.pages.get(key)
+    if old is None:
+        return "new page"
+    if old["hash"] != record["hash"]:
+        return f"{record['source']} changed"
+    deps = old.get("deps")
+    if deps is None:
+        return "no dependency record"
+    for path, digest in deps.items():
+        current = manifest.input_hash(path, old_manifest)
+        if current != digest:
+            if current == "":
+                return f"{path} was removed"
+            if digest == "":
+                return f"{path} was added"
+            return f"{path} changed"
+    if not os.path.exists(dest_path):
+        return "output missing"
+    return None
@@ -0,0 +1,88 @@
+from typing import TextIO
+
+# opening and closing line -> what separates keys from values: "---" opens
+# YAML-like front matter (title: Home), "+++" TOML-like (title = "Home")
+DELIMITERS = {"---": ":", "+++": "="}
+
+
+def parse_value(text: str):
+    # strings, optionally quoted, true/false and [a, b] lists; anything more
+    # elaborate is kept as the string it was written as
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    if text.startswith("[") and text.endswith("]"):
+        return [parse_value(item) for item in text[1:-1].split(",") if item.strip()]
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return text
+
+
+def parse_front_matter(lines: list[str], separator: str) -> dict:
+    meta = {}
+    key = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("- ") and key is not None:
+            # a YAML block list under the previous key
+            items = meta[key] if isinstance(meta[key], list) else []
+            items.append(parse_value(line[2:]))
+            meta[key] = items
+            continue
+        name, found, value = line.partition(separator)
+        if not found:
+            continue
+        key = name.strip().lower()
+        meta[key] = parse_value(value)
+    return normalize(meta)
+
+
+def normalize(meta: dict) -> dict:
+    # the fields the build relies on always have the same type
+    tags = meta.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    meta["tags"] = [str(tag) for tag in tags]
+    meta["draft"] = meta.get("draft", False) is True
+    for field in ("title", "date"):
+        if field in meta:
+            meta[field] = str(meta[field])
+    return meta
+
+
+def read_front_matter(file: TextIO) -> tuple[dict, int]:
+    # Reads only as far as the closing delimiter. Returns the metadata and
+    # the offset the markdown starts at, with the file positioned there. A
+    # file without front matter, or whose front matter is never closed, is
+    # all markdown.
+    delimiter = file.readline().rstrip()
+    separator = DELIMITERS.get(delimiter)
+    if separator is not None:
+        lines = []
+        for line in iter(file.readline, ""):
+            if line.rstrip() == delimiter:
+                return parse_front_matter(lines, separator), file.tell()
+            lines.append(line)
+    file.seek(0)
+    return normalize({}), 0
+
+
+def split_front_matter(markdown: str) -> tuple[dict, str]:
+    # read_front_matter for a document that is already in memory
+    first_end = markdown.find("\n")
+    delimiter = markdown[:first_end].rstrip() if first_end != -1 else ""
+    separator = DELIMITERS.get(delimiter)
+    if separator is not None:
+        start = first_end + 1
+        while start < len(markdown):
+            end = markdown.find("\n", start)
+            if end == -1:
+                end = len(markdown)
+            if markdown[start:end].rstrip() == delimiter:
+                lines = markdown[first_end + 1 : start].split("\n")
+                return parse_front_matter(lines, separator), markdown[end + 1 :]
+            start = end + 1
+    return normalize({}), markdown
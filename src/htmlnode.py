@@ -1,7 +1,10 @@
-import os
+import io
 
 
 class HTMLNode:
+    # nodes are created for every inline fragment, so they carry no __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -20,7 +23,12 @@ class HTMLNode:
         return f"HTMLNode({self.tag}, {self.value}, {self.props}, {self.children})"
 
     def to_html(self) -> str:
-        raise NotImplemented
+        out = io.StringIO()
+        self.write_html(out)
+        return out.getvalue()
+
+    def write_html(self, out) -> None:
+        raise NotImplementedError
 
     def props_to_html(self):
         props = ""
@@ -34,6 +42,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
@@ -47,20 +57,23 @@ class LeafNode(HTMLNode):
         html = f"<{self.tag}{props}>{self.value}</{self.tag}>"
         return html
 
+    def write_html(self, out) -> None:
+        out.write(self.to_html())
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, children=None, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def write_html(self, out) -> None:
         if self.tag is None:
             raise ValueError("parent node must have a tag")
         if self.children is None:
             raise ValueError("parent node requires children")
 
-        html = f"<{self.tag}{self.props_to_html()}>"
+        out.write(f"<{self.tag}{self.props_to_html()}>")
         for node in self.children:
-            html += node.to_html()
-        html += f"</{self.tag}>"
-
-        return html
+            node.write_html(out)
+        out.write(f"</{self.tag}>")
@@ -0,0 +1,20 @@
+from render_cache import RenderCache
+
+INLINE_CACHE_NAME = ".inline-cache.json"
+
+# the cache text_to_children uses in this process, None when caching is off
+_active = None
+
+
+class InlineCache(RenderCache):
+    # inline markdown fragment -> rendered html
+    label = "inline cache"
+
+
+def install_cache(cache: InlineCache | None) -> None:
+    global _active
+    _active = cache
+
+
+def active_cache() -> InlineCache | None:
+    return _active
@@ -11,16 +11,121 @@ from textnode import (
 )
 
 
-def text_to_textnodes(text) -> list[TextNode]:
-    nodes = [TextNode(text, text_type_text)]
-    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
-    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
-    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_links(nodes)
+# the tokens that can open an inline span; everything else is plain text
+_inline_start = re.compile(r"`|\*\*|\*|!\[|\[")
+# while looking for a closing "*" or "**": whole code spans and runs of stars
+_closer_candidates = re.compile(r"`[^`]*`|\*+")
+# [text](url), with no brackets in the text and no parentheses in the url.
+# The page tokenizer and the extract_/split_ functions share this grammar,
+# so they agree on what is a link or an image.
+_link_syntax = r"\[([^\[\]]*)\]\(([^\(\)]*)\)"
+_image = re.compile(r"!" + _link_syntax)
+# the lookbehind keeps the "[alt](url)" inside an image from counting as a link
+_link = re.compile(r"(?<!!)" + _link_syntax)
+_image_or_link = re.compile(r"!?" + _link_syntax)
+
+
+def text_to_textnodes(text: str) -> list[TextNode]:
+    nodes = []
+    plain_start = 0
+    pos = 0
+    # delimiters known to have no closer left, every later opener is literal
+    unclosed = set()
+
+    while True:
+        match = _inline_start.search(text, pos)
+        if match is None:
+            break
+        pos = match.start()
+        token = match.group()
+        if token in unclosed:
+            pos = match.end()
+            continue
+
+        if token == "![" or token == "[":
+            span = (_image if token == "![" else _link).match(text, pos)
+            if span is None:
+                pos += 1
+                continue
+            if plain_start < pos:
+                nodes.append(TextNode(text[plain_start:pos], text_type_text))
+            span_type = text_type_image if token == "![" else text_type_link
+            nodes.append(TextNode(span.group(1), span_type, span.group(2)))
+            pos = plain_start = span.end()
+            continue
+
+        content_start = match.end()
+        if token == "`":
+            close = text.find("`", content_start)
+        else:
+            close = find_closing_delim(text, token, content_start)
+        if close == -1:
+            unclosed.add(token)
+            pos = content_start
+            continue
+
+        if plain_start < pos:
+            nodes.append(TextNode(text[plain_start:pos], text_type_text))
+        nodes.append(TextNode(text[content_start:close], _delim_types[token]))
+        pos = plain_start = close + len(token)
+
+    if plain_start < len(text) or not nodes:
+        nodes.append(TextNode(text[plain_start:], text_type_text))
     return nodes
 
 
+_delim_types = {
+    "**": text_type_bold,
+    "*": text_type_italic,
+    "`": text_type_code,
+}
+
+
+def find_closing_delim(text: str, delim: str, pos: int) -> int:
+    # Looks for the "*" or "**" closing a span whose content starts at pos.
+    # Code spans are skipped whole and a span of the other delimiter nested
+    # inside is skipped up to its own closer, so "**a *b* c**" closes at the
+    # last "**". Returns -1 when there is no closer. The spans still open are
+    # kept on a stack rather than in recursive calls, so deep nesting in long
+    # text can't exhaust the interpreter's stack.
+    # (delimiter, content start) of the spans around the innermost one
+    stack = []
+    start = pos
+    # (delimiter, content start) of nested spans found to have no closer;
+    # their opener is plain text
+    unclosed = set()
+    while True:
+        match = _closer_candidates.search(text, pos)
+        if match is None:
+            if not stack:
+                return -1
+            # the innermost span is never closed, so its opener is literal
+            # and the span around it goes on right after it
+            unclosed.add((delim, start))
+            pos = start
+            delim, start = stack.pop()
+            continue
+        run = match.group()
+        if run[0] == "`":
+            pos = match.end()
+            continue
+        if len(run) == len(delim) or len(run) > 2:
+            if not stack:
+                return match.start()
+            pos = match.start() + len(delim)
+            delim, start = stack.pop()
+            continue
+        nested = "*" if delim == "**" else "**"
+        pos = match.end()
+        if (nested, pos) not in unclosed:
+            stack.append((delim, start))
+            delim, start = nested, pos
+
+
+def has_inline_markup(text: str) -> bool:
+    return _inline_start.search(text) is not None
+
+
 def split_nodes_delimiter(
     old_nodes: list[TextNode], delim: str, text_type: str
 ) -> list[TextNode]:
@@ -28,95 +133,68 @@ def split_nodes_delimiter(
 
     for node in old_nodes:
         text = node.text
-        if not has_open_close_delim(node.text, delim):
+        if node.text_type != text_type_text or not has_open_close_delim(text, delim):
             new_nodes.append(node)
             continue
 
-        if text.find(delim) == 0:
-            split_text = text.split(delim)
-            new_nodes.append(TextNode(split_text[1], text_type))
-            new_nodes.append(TextNode(f"{split_text[2]}", text_type_text))
-            continue
-
-        if text.rfind(delim) == len(text) - 1:
-            split_text = text.split(delim)
-            new_nodes.append(TextNode(f"{split_text[0]}", text_type_text))
-            new_nodes.append(TextNode(split_text[1], text_type))
-            continue
-
         split_text = text.split(delim)
-        new_nodes.append(TextNode(f"{split_text[0]}", text_type_text))
-        new_nodes.append(TextNode(split_text[1], text_type))
-        new_nodes.append(TextNode(f"{split_text[2]}", text_type_text))
+        if len(split_text) % 2 == 0:
+            # an odd number of delimiters, the last one stays literal text
+            split_text[-2:] = [f"{split_text[-2]}{delim}{split_text[-1]}"]
+        for i, part in enumerate(split_text):
+            if i % 2 == 1:
+                new_nodes.append(TextNode(part, text_type))
+            elif part:
+                new_nodes.append(TextNode(part, text_type_text))
 
     return new_nodes
 
 
 def has_open_close_delim(text: str, delim: str) -> bool:
-    return text.count(delim) == 2
+    return text.count(delim) >= 2
 
 
 def extract_markdown_images(text: str) -> list[tuple] | list[None]:
-    expr = re.compile(r"!\[(.*?)\]\((.*?)\)")
-    image_alt_text = re.findall(expr, text)
-    return image_alt_text
+    return _image.findall(text)
 
 
 def extract_markdown_links(text: str) -> list[tuple] | list[None]:
-    expr = re.compile(r"\[(.*?)\]\((.*?)\)")
-    links_anchor_url = re.findall(expr, text)
-    return links_anchor_url
+    return _link.findall(text)
 
 
 def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
-    new_nodes = []
-    for node in old_nodes:
-        txt = node.text
-        images = extract_markdown_images(txt)
-        if images:
-            for alt_text, img_url in images:
-                img = f"![{alt_text}]({img_url})"
-
-                img_idx = txt.find(img)
-                img_node = TextNode(alt_text, text_type_image, img_url)
-
-                if img_idx == 0:
-                    new_nodes.append(img_node)
-                else:
-                    text_to_strip = txt[:img_idx]
-                    text_node = TextNode(text_to_strip, text_type_text)
-                    new_nodes.extend([text_node, img_node])
-                txt = txt[img_idx + len(img) :]
-        else:
-            new_nodes.append(node)
-            continue
-        if len(txt) > 0:
-            new_nodes.append(TextNode(txt, text_type_text))
-    return new_nodes
+    return _split_nodes(old_nodes, _image)
 
 
 def split_nodes_links(old_nodes: list[TextNode]) -> list[TextNode]:
+    return _split_nodes(old_nodes, _link)
+
+
+def split_nodes_image_link(old_nodes: list[TextNode]) -> list[TextNode]:
+    return _split_nodes(old_nodes, _image_or_link)
+
+
+def _split_nodes(old_nodes: list[TextNode], pattern: re.Pattern) -> list[TextNode]:
+    # One finditer pass per text node; the text between the images or links
+    # it finds is cut out by match offsets rather than searched for again.
     new_nodes = []
     for node in old_nodes:
-        txt = node.text
-        links = extract_markdown_links(txt)
-        if links:
-            for anchor_text, link_url in links:
-                link = f"[{anchor_text}]({link_url})"
-
-                link_idx = txt.find(link)
-                link_node = TextNode(anchor_text, text_type_link, link_url)
-
-                if link_idx == 0:
-                    new_nodes.append(link_node)
-                else:
-                    text_to_strip = txt[:link_idx]
-                    text_node = TextNode(text_to_strip, text_type_text)
-                    new_nodes.extend([text_node, link_node])
-                txt = txt[link_idx + len(link) :]
-        else:
+        text = node.text
+        if node.text_type != text_type_text:
             new_nodes.append(node)
             continue
-        if len(txt) > 0:
-            new_nodes.append(TextNode(txt, text_type_text))
+
+        plain_start = 0
+        for match in pattern.finditer(text):
+            start = match.start()
+            if plain_start < start:
+                new_nodes.append(TextNode(text[plain_start:start], text_type_text))
+            span_type = text_type_image if text[start] == "!" else text_type_link
+            new_nodes.append(TextNode(match.group(1), span_type, match.group(2)))
+            plain_start = match.end()
+
+        if plain_start == 0:
+            new_nodes.append(node)
+        elif plain_start < len(text):
+            new_nodes.append(TextNode(text[plain_start:], text_type_text))
     return new_nodes
@@ -0,0 +1,86 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+
+def read_file(path: str) -> str:
+    with open(path, "r") as file:
+        return file.read()
+
+
+def write_file(path: str, contents: str) -> None:
+    with open(path, "w") as file:
+        file.write(contents)
+
+
+def prefetch(
+    paths: Iterable[str],
+    threads: int = 4,
+    depth: int = 8,
+    read: Callable[[str], object] = read_file,
+) -> Iterator[tuple[str, object]]:
+    # Yields (path, read(path)) in order while up to depth reads run ahead on
+    # a thread pool, so the caller's work on one file overlaps the reads of
+    # the next ones.
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending: deque[tuple[str, Future]] = deque()
+        paths = iter(paths)
+        for path in paths:
+            pending.append((path, executor.submit(read, path)))
+            if len(pending) >= depth:
+                break
+        while pending:
+            path, future = pending.popleft()
+            contents = future.result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(read, next_path)))
+            yield path, contents
+
+
+class BackgroundWriter:
+    # Writes files on a thread pool. submit blocks once max_pending writes are
+    # queued, which bounds the rendered pages held in memory. The first write
+    # error is raised from submit or close.
+    def __init__(
+        self,
+        threads: int = 4,
+        max_pending: int = 8,
+        write: Callable[[str, str], object] = write_file,
+    ) -> None:
+        self.write = write
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.Semaphore(max_pending)
+        self.futures: list[Future] = []
+        self.error: BaseException | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is None:
+            self.close()
+        else:
+            # already failing, just let the queued writes finish
+            self.executor.shutdown(wait=True)
+
+    def submit(self, path: str, contents: str) -> None:
+        if self.error is not None:
+            raise self.error
+        self.slots.acquire()
+        future = self.executor.submit(self.write, path, contents)
+        future.add_done_callback(self._done)
+        self.futures.append(future)
+
+    def _done(self, future: Future) -> None:
+        self.slots.release()
+        if future.exception() is not None and self.error is None:
+            self.error = future.exception()
+
+    def close(self) -> list:
+        # waits for every write and returns what write returned for each
+        self.executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+        return [future.result() for future in self.futures]
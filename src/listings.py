@@ -0,0 +1,222 @@
+import datetime
+import html
+import posixpath
+import re
+
+from htmlnode import LeafNode, ParentNode
+from template import Template
+
+FEED_NAME = "feed.xml"
+# entries per listing page, and in the feed
+PAGE_SIZE = 20
+FEED_SIZE = 20
+
+_slug_chars = re.compile(r"[^a-z0-9]+")
+# a day written without zero padding, e.g. 2024-5-1, and whatever follows it
+_loose_date = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(.*)")
+_undated = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+
+def parse_date(date: str) -> datetime.datetime | None:
+    # ISO dates and timestamps, also with unpadded months and days; dates
+    # without a timezone are taken as UTC so that all of them compare
+    try:
+        parsed = datetime.datetime.fromisoformat(date)
+    except ValueError:
+        match = _loose_date.fullmatch(date.strip())
+        if match is None:
+            return None
+        year, month, day, rest = match.groups()
+        try:
+            parsed = datetime.datetime.fromisoformat(
+                f"{year}-{int(month):02}-{int(day):02}{rest}"
+            )
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+class Entry:
+    __slots__ = ("key", "title", "date", "tags", "parsed_date")
+
+    def __init__(self, key: str, meta: dict) -> None:
+        self.key = key
+        self.title = meta["title"]
+        self.date = meta.get("date", "")
+        self.tags = meta["tags"]
+        # None when the page has no date or one that can't be read
+        self.parsed_date = parse_date(self.date) if self.date else None
+
+    def __repr__(self):
+        return f"Entry({self.key}, {self.title}, {self.date})"
+
+    def url(self) -> str:
+        if self.key == "index.html":
+            return "/"
+        if self.key.endswith("/index.html"):
+            return f"/{self.key[: -len('index.html')]}"
+        return f"/{self.key}"
+
+
+def sort_entries(pages: list[tuple[str, dict]]) -> list[Entry]:
+    # newest first, undated pages and unreadable dates last, ties by path;
+    # every listing is filtered from this one sorted list, so it stays in
+    # this order
+    entries = sorted((Entry(key, meta) for key, meta in pages), key=_by_key)
+    entries.sort(key=_by_date, reverse=True)
+    return entries
+
+
+def _by_key(entry: Entry) -> str:
+    return entry.key
+
+
+def _by_date(entry: Entry) -> datetime.datetime:
+    return entry.parsed_date or _undated
+
+
+def tag_slug(tag: str) -> str:
+    return _slug_chars.sub("-", tag.lower()).strip("-") or "tag"
+
+
+def build_listings(
+    entries: list[Entry], page_keys: set[str], template: Template
+) -> dict[str, str]:
+    # Renders every section listing and tag page in one pass over entries.
+    # Returns output key -> html. Sections with an index page of their own
+    # keep it, and no listing replaces a page built from a source.
+    sections: dict[str, list[Entry]] = {}
+    tags: dict[str, tuple[str, list[Entry]]] = {}
+    for entry in entries:
+        if posixpath.basename(entry.key) != "index.html":
+            sections.setdefault(posixpath.dirname(entry.key), []).append(entry)
+        for tag in entry.tags:
+            slug = tag_slug(tag)
+            if slug not in tags:
+                tags[slug] = (tag, [])
+            tags[slug][1].append(entry)
+
+    listings = {}
+    for section, section_entries in sections.items():
+        base = f"{section}/" if section else ""
+        title = section.rsplit("/", 1)[-1] if section else "Home"
+        paginate(listings, base, title, section_entries, template)
+    for slug, (tag, tag_entries) in tags.items():
+        paginate(listings, f"tags/{slug}/", f"Tagged {tag}", tag_entries, template)
+    if tags:
+        items = [
+            ParentNode(
+                "li",
+                [
+                    LeafNode("a", html.escape(tag), {"href": f"/tags/{slug}/"}),
+                    LeafNode(None, f" ({len(tag_entries)})"),
+                ],
+            )
+            for slug, (tag, tag_entries) in sorted(tags.items())
+        ]
+        listings["tags/index.html"] = render_listing(
+            template, "Tags", [ParentNode("ul", items)]
+        )
+    return {key: page for key, page in listings.items() if key not in page_keys}
+
+
+def paginate(
+    listings: dict[str, str],
+    base: str,
+    title: str,
+    entries: list[Entry],
+    template: Template,
+    page_size: int = PAGE_SIZE,
+) -> None:
+    # base/index.html holds the first page_size entries, base/page/N/ the rest
+    pages = max(1, -(-len(entries) // page_size))
+    for number in range(1, pages + 1):
+        chunk = entries[(number - 1) * page_size : number * page_size]
+        children = [
+            ParentNode("ul", [ParentNode("li", entry_nodes(entry)) for entry in chunk])
+        ]
+        if pages > 1:
+            children.append(pagination_nodes(base, number, pages))
+        page_title = title if number == 1 else f"{title}, page {number}"
+        listings[page_key(base, number)] = render_listing(
+            template, page_title, children
+        )
+
+
+def page_key(base: str, number: int) -> str:
+    if number == 1:
+        return f"{base}index.html"
+    return f"{base}page/{number}/index.html"
+
+
+def entry_nodes(entry: Entry) -> list:
+    nodes = [LeafNode("a", html.escape(entry.title), {"href": entry.url()})]
+    if entry.date:
+        nodes.append(LeafNode(None, " "))
+        nodes.append(LeafNode("time", html.escape(entry.date)))
+    return nodes
+
+
+def page_url(base: str, number: int) -> str:
+    if number == 1:
+        return f"/{base}"
+    return f"/{base}page/{number}/"
+
+
+def pagination_nodes(base: str, number: int, pages: int) -> ParentNode:
+    links = []
+    if number > 1:
+        links.append(LeafNode("a", "Newer", {"href": page_url(base, number - 1)}))
+    if number < pages:
+        links.append(LeafNode("a", "Older", {"href": page_url(base, number + 1)}))
+    return ParentNode("nav", links)
+
+
+def render_listing(template: Template, title: str, children: list) -> str:
+    return template.render(
+        {"title": html.escape(title), "content": ParentNode("div", children)}
+    )
+
+
+def atom_date(date: str) -> str | None:
+    # front matter dates are usually plain days; Atom wants a full timestamp
+    parsed = parse_date(date)
+    return parsed.isoformat() if parsed is not None else None
+
+
+def atom_feed(
+    entries: list[Entry], site_url: str, title: str, size: int = FEED_SIZE
+) -> str:
+    # The newest dated pages. Nothing in it depends on the time of the
+    # build, so an unchanged site produces an identical feed.
+    site_url = site_url.rstrip("/")
+    dated = []
+    for entry in entries:
+        if entry.parsed_date is not None:
+            dated.append((entry, entry.parsed_date.isoformat()))
+            if len(dated) == size:
+                break
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>{html.escape(title)}</title>",
+        f"<id>{html.escape(site_url)}/</id>",
+        f'<link href="{html.escape(site_url)}/"/>',
+        f'<link rel="self" href="{html.escape(site_url)}/{FEED_NAME}"/>',
+        f"<updated>{dated[0][1] if dated else '1970-01-01T00:00:00+00:00'}</updated>",
+        f"<author><name>{html.escape(title)}</name></author>",
+    ]
+    for entry, updated in dated:
+        url = html.escape(f"{site_url}{entry.url()}")
+        lines.append("<entry>")
+        lines.append(f"<title>{html.escape(entry.title)}</title>")
+        lines.append(f"<id>{url}</id>")
+        lines.append(f'<link href="{url}"/>')
+        lines.append(f"<updated>{updated}</updated>")
+        for tag in entry.tags:
+            lines.append(f'<category term="{html.escape(tag)}"/>')
+        lines.append("</entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
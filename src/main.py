@@ -1,99 +1,663 @@
+import argparse
 import os
-import pathlib
-import shutil
+import posixpath
+import re
+from concurrent.futures import ProcessPoolExecutor
 
-from markdown_blocks import markdown_to_html_node
+import profiler
+import watch
+import block_cache
+import inline_cache
+from assets import CopyStats, copy_asset, sync_assets
+from block_cache import BLOCK_CACHE_NAME, BlockCache
+from compress import compress_outputs, gzip_path, remove_gzip
+from content_index import ContentIndex
+from dependencies import page_dependencies, rebuild_reason
+from front_matter import read_front_matter, split_front_matter
+from inline_cache import INLINE_CACHE_NAME, InlineCache
+from io_pipeline import BackgroundWriter, prefetch, read_file
+from listings import FEED_NAME, atom_feed, build_listings, sort_entries
+from manifest import BuildManifest
+from markdown_blocks import StreamedDocument, markdown_to_html_node
+from output import AtomicOutput, OutputStats, PageResult, write_output
+from template import Template, load_template
+
+# markdown files at least this big are rendered block by block
+STREAM_THRESHOLD = 8 << 20
+
+_title_line = re.compile(r"^# (.*)$", re.M)
+
+# where the preview server runs; the feed's links need an absolute url
+DEFAULT_SITE_URL = "http://localhost:8888/"
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of worker processes to render pages with, 0 for one per CPU",
+        default=1,
+    )
+    parser.add_argument(
+        "--profile",
+        type=int,
+        nargs="?",
+        const=10,
+        help="Time every build stage and list the N slowest pages (default 10)",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=str,
+        help="Write a Chrome trace of the build to this file",
+        default=None,
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild whatever changes",
+    )
+    parser.add_argument(
+        "--inline-cache",
+        action="store_true",
+        help="Reuse rendered inline fragments across pages and builds",
+    )
+    parser.add_argument(
+        "--block-cache",
+        action="store_true",
+        help="Reuse the rendered html of unchanged blocks across builds",
+    )
+    parser.add_argument(
+        "--io-threads",
+        type=int,
+        help="Threads that prefetch sources and write pages in the background",
+        default=0,
+    )
+    parser.add_argument(
+        "--gzip",
+        type=int,
+        nargs="?",
+        const=6,
+        help="Write a .gz copy of every changed page at this level (default 6)",
+        default=None,
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help="Also build pages whose front matter marks them as drafts",
+    )
+    parser.add_argument(
+        "--listings",
+        action="store_true",
+        help="Generate section listings, tag pages and an Atom feed",
+    )
+    parser.add_argument(
+        "--site-url",
+        type=str,
+        help="Absolute url the site is published at, for the feed",
+        default=DEFAULT_SITE_URL,
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print why each rebuilt page had to be rebuilt",
+    )
+    args = parser.parse_args()
+
+    build_profile = None
+    if args.profile is not None or args.profile_trace:
+        build_profile = profiler.BuildProfile()
+
+    inline = None
+    inline_path = os.path.join("./public/", INLINE_CACHE_NAME)
+    if args.inline_cache:
+        inline = InlineCache.load(inline_path)
+
+    block = None
+    block_path = os.path.join("./public/", BLOCK_CACHE_NAME)
+    if args.block_cache:
+        block = BlockCache.load(block_path, maxsize=1_000_000)
+
     # generate_page("./content/index.md", "./template.html", "./public/index.html")
-    generate_pages_recursive("./content/", "./template.html", "./public/")
-    # move_files("./static", "./public")
+    generate_pages_recursive(
+        "./content/",
+        "./template.html",
+        "./public/",
+        args.jobs,
+        build_profile,
+        inline,
+        block,
+        args.io_threads,
+        args.gzip,
+        "./static",
+        args.explain,
+        drafts=args.drafts,
+        listings=args.listings,
+        site_url=args.site_url,
+    )
+
+    for cache, cache_path in (
+        (inline, inline_path),
+        (block, block_path),
+    ):
+        if cache is not None:
+            cache.save(cache_path)
+            print(cache.stats())
 
+    if build_profile is not None:
+        print(build_profile.summary(args.profile or 10))
+        if args.profile_trace:
+            build_profile.write_trace(args.profile_trace)
+    if os.path.isdir("./static"):
+        move_files("./static", "./public")
 
-def move_files(from_path: str, to_path) -> None:
+    if args.watch:
+        watch_site(
+            "./content/",
+            "./template.html",
+            "./public/",
+            "./static",
+            args.jobs,
+            gzip_level=args.gzip,
+            drafts=args.drafts,
+            listings=args.listings,
+            site_url=args.site_url,
+        )
+
+
+def move_files(from_path: str, to_path, threads: int = 4) -> CopyStats:
+    # copies what changed since the last run, on a thread pool
     if not os.path.exists(from_path):
         raise Exception(f"the path {from_path} does not exist")
 
-    if not os.path.exists(to_path):
-        print(f"creating {to_path}")
-        os.mkdir(to_path)
-
-    dir_items = os.listdir(from_path)
-    print(f"Files and folders to be copied -- {dir_items}")
-    for item in dir_items:
-        item_from_path = os.path.join(from_path, item)
-        item_to_path = os.path.join(to_path, item)
-        if os.path.isfile(item_from_path) and os.path.splitroot:
-            print(f"copying {item_from_path} to {item_to_path}")
-            shutil.copy(item_from_path, item_to_path)
-        elif os.path.isdir(item_from_path):
-            move_files(item_from_path, item_to_path)
-        else:
-            raise Exception(f"don't recognize {item} as file or dir")
+    stats = sync_assets(from_path, to_path, threads)
+    print(f"Static files: {stats.summary()}")
+    return stats
 
 
 def extract_title(markdown: str) -> str:
-    lines = markdown.split("\n")
-    for line in lines:
+    # stops at the first heading instead of splitting the whole document
+    match = _title_line.search(markdown)
+    if match is None:
+        raise Exception("no header in this file")
+    return match.group(1)
+
+
+def read_title(markdown_file) -> str:
+    for line in markdown_file:
         if line.startswith("# "):
-            return line[2:]
+            return line[2:].rstrip("\n")
     raise Exception("no header in this file")
 
 
-def generate_page(from_path: str, template_path: str, dest_path: str) -> None:
+def page_metadata(markdown: str) -> tuple[dict, str]:
+    # front matter and the markdown after it; the first heading is the title
+    # unless the front matter sets one
+    meta, body = split_front_matter(markdown)
+    if "title" not in meta:
+        meta["title"] = extract_title(body)
+    return meta, body
+
+
+def read_page_metadata(markdown_file) -> tuple[dict, int]:
+    # page_metadata reading no further than the front matter and, without a
+    # title there, the first heading. Also returns where the markdown starts.
+    meta, start = read_front_matter(markdown_file)
+    if "title" not in meta:
+        meta["title"] = read_title(markdown_file)
+    return meta, start
+
+
+def load_page_metadata(from_path: str) -> dict:
+    with open(from_path, "r") as from_file:
+        return read_page_metadata(from_file)[0]
+
+
+def template_values(meta: dict) -> dict:
+    # every front matter field can be used in the template, lists as a
+    # comma separated string
+    values = {}
+    for name, value in meta.items():
+        if isinstance(value, list):
+            value = ", ".join(value)
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        values[name] = value if isinstance(value, str) else str(value)
+    return values
+
+
+def generate_page(
+    from_path: str,
+    template_path: str,
+    dest_path: str,
+    template: Template | None = None,
+    profile: bool = False,
+) -> PageResult:
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    from_contents = ""
+    page_profile = profiler.begin_page(from_path) if profile else None
+    try:
+        if template is None:
+            template = load_template(template_path)
+
+        if os.path.getsize(from_path) >= STREAM_THRESHOLD:
+            result = generate_streamed_page(from_path, template, dest_path)
+            result.profile = page_profile
+            return result
+
+        from_contents = ""
+        with profiler.stage("read"):
+            with open(from_path, "r") as from_file:
+                from_contents = from_file.read()
+
+        meta, body = page_metadata(from_contents)
+        values = template_values(meta)
+        images = []
+        contents = markdown_to_html_node(body, images)
+        values["content"] = contents
+
+        # dirs = os.path.dirname(dest_path)
+        # os.makedirs(dirs, exist_ok=True)
+
+        if page_profile is None:
+            # the page is serialized straight into the file rather than built
+            # up as one string first
+            output = AtomicOutput(dest_path)
+            with output as dest_file:
+                template.write(dest_file, values)
+            return PageResult(
+                dest_path, output.status, output.digest, images=images
+            )
+
+        # when profiling, serialization, templating and writing run one after
+        # the other so each can be timed on its own; the output is the same
+        profiler.count("html nodes", profiler.count_nodes(contents))
+        with profiler.stage("html serialization"):
+            values["content"] = contents.to_html()
+        with profiler.stage("templating"):
+            html = template.render(values)
+        with profiler.stage("write"):
+            status, digest = write_output(dest_path, html)
+    finally:
+        if page_profile is not None:
+            profiler.end_page()
+    return PageResult(dest_path, status, digest, page_profile, images)
+
+
+def render_page(
+    markdown: str, template: Template, images: list[str] | None = None
+) -> str:
+    meta, body = page_metadata(markdown)
+    values = template_values(meta)
+    values["content"] = markdown_to_html_node(body, images)
+    return template.render(values)
+
+
+def _read_source(from_path: str) -> str | None:
+    # big sources are left to the streaming renderer instead
+    if os.path.getsize(from_path) >= STREAM_THRESHOLD:
+        return None
+    return read_file(from_path)
+
+
+def generate_pages_pipelined(
+    pages: list[tuple[str, str]],
+    template_path: str,
+    template: Template,
+    io_threads: int,
+) -> list[PageResult]:
+    # the next sources are read while this page renders and the previous
+    # pages are written; both queues are bounded to limit memory
+    depth = io_threads * 2
+    from_paths = [from_path for from_path, _ in pages]
+    sources = prefetch(from_paths, io_threads, depth, _read_source)
+    results = []
+    submitted = []
+    writer = BackgroundWriter(io_threads, depth, write_output)
+    with writer:
+        for (from_path, from_contents), (_, dest_path) in zip(sources, pages):
+            if from_contents is None:
+                results.append(
+                    generate_page(from_path, template_path, dest_path, template)
+                )
+                continue
+            print(
+                f"Generating page from {from_path} to {dest_path} using {template_path}"
+            )
+            images = []
+            writer.submit(dest_path, render_page(from_contents, template, images))
+            submitted.append((dest_path, images))
+    for (dest_path, images), (status, digest) in zip(submitted, writer.close()):
+        results.append(PageResult(dest_path, status, digest, images=images))
+    return results
+
+
+def generate_streamed_page(
+    from_path: str, template: Template, dest_path: str
+) -> PageResult:
+    # memory stays proportional to the largest block rather than the page
+    output = AtomicOutput(dest_path)
+    images = []
     with open(from_path, "r") as from_file:
-        from_contents = from_file.read()
+        with profiler.stage("read"):
+            meta, start = read_page_metadata(from_file)
+        values = template_values(meta)
+        values["content"] = StreamedDocument(from_file, start, images)
+        with profiler.stage("write"):
+            with output as dest_file:
+                template.write(dest_file, values)
+    return PageResult(dest_path, output.status, output.digest, images=images)
+
+
+# each worker process reads the template once, in _init_worker, and reuses it
+# for every page it renders
+_worker_template = None
+
+
+def _install_caches(inline: InlineCache | None, block: BlockCache | None) -> None:
+    inline_cache.install_cache(inline)
+    block_cache.install_cache(block)
 
-    template_contents = ""
-    with open(template_path, "r") as template_file:
-        template_contents = template_file.read()
 
-    title = extract_title(from_contents)
-    contents = markdown_to_html_node(from_contents).to_html()
+def _init_worker(
+    template_path: str, inline: InlineCache | None, block: BlockCache | None
+) -> None:
+    global _worker_template
+    _worker_template = load_template(template_path)
+    # each worker starts from a copy of the parent's caches and shares them
+    # between the pages it renders; new entries go back with every page
+    for cache in (inline, block):
+        if cache is not None:
+            cache.track_updates()
+    _install_caches(inline, block)
+
+
+def _generate_page_in_worker(page: tuple[str, str, str, bool]) -> tuple:
+    from_path, template_path, dest_path, profile = page
+    result = generate_page(
+        from_path, template_path, dest_path, _worker_template, profile
+    )
+    cache_updates = []
+    for cache in (inline_cache.active_cache(), block_cache.active_cache()):
+        cache_updates.append(cache.take_updates() if cache is not None else None)
+    return result, cache_updates
+
 
-    template_contents = template_contents.replace("{{ Title }}", title)
-    template_contents = template_contents.replace("{{ Content }}", contents)
+def generate_pages(
+    pages: list[tuple[str, str]],
+    template_path: str,
+    jobs: int = 1,
+    build_profile: profiler.BuildProfile | None = None,
+    inline: InlineCache | None = None,
+    block: BlockCache | None = None,
+    io_threads: int = 0,
+) -> list[PageResult]:
+    profile = build_profile is not None
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    results = []
+    if jobs == 1 or len(pages) < 2:
+        template = load_template(template_path)
+        _install_caches(inline, block)
+        try:
+            # profiling times every stage of a page in turn, so it never
+            # overlaps them
+            if io_threads > 0 and not profile and len(pages) > 1:
+                return generate_pages_pipelined(
+                    pages, template_path, template, io_threads
+                )
+            for from_path, dest_path in pages:
+                result = generate_page(
+                    from_path, template_path, dest_path, template, profile
+                )
+                if result.profile is not None:
+                    build_profile.add(result.profile)
+                results.append(result)
+        finally:
+            _install_caches(None, None)
+        return results
 
-    # dirs = os.path.dirname(dest_path)
-    # os.makedirs(dirs, exist_ok=True)
+    jobs = min(jobs, len(pages))
+    work = [
+        (from_path, template_path, dest_path, profile)
+        for from_path, dest_path in pages
+    ]
+    chunksize = max(1, len(work) // (jobs * 4))
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(template_path, inline, block),
+    ) as executor:
+        # consuming the results re-raises the first error a worker hit
+        done = executor.map(_generate_page_in_worker, work, chunksize=chunksize)
+        for result, cache_updates in done:
+            if result.profile is not None:
+                build_profile.add(result.profile)
+            for cache, updates in zip((inline, block), cache_updates):
+                if updates is not None:
+                    cache.merge(updates)
+            results.append(result)
+    return results
 
-    with open(dest_path, "w") as dest_file:
-        dest_file.write(template_contents)
+
+def find_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    return ContentIndex.scan(dir_path_content, dest_dir_path).page_paths()
 
 
 def generate_pages_recursive(
-    dir_path_content: str, template_path: str, dest_dir_path: str
+    dir_path_content: str,
+    template_path: str,
+    dest_dir_path: str,
+    jobs: int = 1,
+    build_profile: profiler.BuildProfile | None = None,
+    inline: InlineCache | None = None,
+    block: BlockCache | None = None,
+    io_threads: int = 0,
+    gzip_level: int | None = None,
+    static_dir: str | None = None,
+    explain: bool = False,
+    index: ContentIndex | None = None,
+    drafts: bool = False,
+    listings: bool = False,
+    site_url: str = DEFAULT_SITE_URL,
+) -> OutputStats:
+    # watch mode keeps its index up to date and passes it in
+    if index is None:
+        index = ContentIndex.scan(dir_path_content, dest_dir_path)
+    os.makedirs(dest_dir_path, exist_ok=True)
+
+    old_manifest = BuildManifest.load(dest_dir_path)
+    manifest = BuildManifest()
+
+    # a page is rebuilt when its source or anything recorded in its deps
+    # (the template, the local images it shows) changed since the last build
+    stats = OutputStats()
+    outdated = []
+    keys = {}
+    made_dirs = set()
+    built = []
+    listed = []
+    for page in index:
+        key, from_path, dest_path = page.key, page.source, page.dest_path
+        record = old_manifest.source_record(key, from_path, page.size, page.mtime_ns)
+        if "meta" not in record:
+            # the manifest keeps each page's front matter, so it is only read
+            # again when the source changed
+            record["meta"] = load_page_metadata(from_path)
+        if record["meta"]["draft"] and not drafts:
+            # kept in the manifest for its metadata, without an output
+            manifest.pages[key] = {
+                field: value
+                for field, value in record.items()
+                if field not in ("output", "deps")
+            }
+            if os.path.exists(dest_path):
+                print(f"Removing {dest_path}, it is a draft")
+                os.remove(dest_path)
+                stats.deleted.append(dest_path)
+            continue
+        manifest.pages[key] = record
+        built.append(dest_path)
+        listed.append((key, record["meta"]))
+        reason = rebuild_reason(key, record, old_manifest, manifest, dest_path)
+        if reason is not None:
+            if explain:
+                print(f"Rebuilding {key}: {reason}")
+            stats.reasons[dest_path] = reason
+            dest_parent = os.path.dirname(dest_path)
+            if dest_parent not in made_dirs:
+                os.makedirs(dest_parent, exist_ok=True)
+                made_dirs.add(dest_parent)
+            outdated.append((from_path, dest_path))
+            keys[dest_path] = key
+
+    results = generate_pages(
+        outdated, template_path, jobs, build_profile, inline, block, io_threads
+    )
+    for result in results:
+        stats.record(result.dest_path, result.status)
+        key = keys[result.dest_path]
+        record = manifest.pages[key]
+        record["output"] = result.digest
+        deps = page_dependencies(
+            result.images, template_path, static_dir, posixpath.dirname(key)
+        )
+        record["deps"] = {
+            path: manifest.input_hash(path, old_manifest) for path in deps
+        }
+
+    for key in old_manifest.pages.keys() - manifest.pages.keys():
+        stale_path = os.path.join(dest_dir_path, key)
+        if os.path.exists(stale_path):
+            print(f"Removing {stale_path}, its source was deleted")
+            os.remove(stale_path)
+            stats.deleted.append(stale_path)
+    remove_gzip(stats.deleted)
+
+    # listings come after the pages, whose metadata they are made from
+    listing_stats = OutputStats()
+    if listings:
+        listing_stats = generate_listings(
+            listed, template_path, dest_dir_path, manifest, site_url
+        )
+        built.extend(listing_stats.written + listing_stats.skipped)
+    stale_listings = old_manifest.listings.keys() - manifest.listings.keys()
+    for key in stale_listings - manifest.pages.keys():
+        stale_path = os.path.join(dest_dir_path, key)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            listing_stats.deleted.append(stale_path)
+    remove_gzip(listing_stats.deleted)
+
+    written = stats.written + listing_stats.written
+    if gzip_level is None:
+        remove_gzip(written)
+    else:
+        # pages built before compression was turned on get theirs too
+        written_set = set(written)
+        targets = written + [
+            dest_path
+            for dest_path in built
+            if dest_path not in written_set
+            and not os.path.exists(gzip_path(dest_path))
+        ]
+        compressed = compress_outputs(targets, gzip_level)
+        print(f"Compressed {compressed} pages")
+
+    manifest.save(dest_dir_path)
+    print(f"Pages: {stats.summary()}")
+    if listings or listing_stats.deleted:
+        print(f"Listings: {listing_stats.summary()}")
+    return stats
+
+
+def generate_listings(
+    pages: list[tuple[str, dict]],
+    template_path: str,
+    dest_dir_path: str,
+    manifest: BuildManifest,
+    site_url: str,
+) -> OutputStats:
+    # Section listings, tag pages and the Atom feed, made from the metadata
+    # in the manifest without opening a single source. One sort of all pages
+    # orders every listing, which is then split into pages of PAGE_SIZE.
+    stats = OutputStats()
+    entries = sort_entries(pages)
+    template = load_template(template_path)
+    outputs = build_listings(entries, manifest.pages.keys(), template)
+    site_title = next((meta["title"] for key, meta in pages if key == "index.html"), "")
+    outputs[FEED_NAME] = atom_feed(entries, site_url, site_title or "Feed")
+
+    made_dirs = set()
+    for key, contents in outputs.items():
+        dest_path = os.path.join(dest_dir_path, key)
+        dest_parent = os.path.dirname(dest_path)
+        if dest_parent not in made_dirs:
+            os.makedirs(dest_parent, exist_ok=True)
+            made_dirs.add(dest_parent)
+        status, digest = write_output(dest_path, contents)
+        stats.record(dest_path, status)
+        manifest.listings[key] = digest
+    return stats
+
+
+def watch_site(
+    dir_path_content: str,
+    template_path: str,
+    dest_dir_path: str,
+    static_path: str | None = None,
+    jobs: int = 1,
+    stop=None,
+    gzip_level: int | None = None,
+    drafts: bool = False,
+    listings: bool = False,
+    site_url: str = DEFAULT_SITE_URL,
 ) -> None:
-    to_path = pathlib.Path(dest_dir_path)
-    from_path = pathlib.Path(dir_path_content)
-
-    if not from_path.exists():
-        raise Exception(f"the path {dir_path_content} does not exist")
-
-    if not to_path.exists():
-        # print(f"creating {dest_dir_path}")
-        to_path.mkdir()
-
-    dir_items = os.listdir(dir_path_content)
-    for item in dir_items:
-        origin = from_path.joinpath(item)
-        dest = to_path.joinpath(item)
-        # print(f"org: {origin} dest: {dest}")
-
-        if origin.is_dir():
-            # print(f"origin is {origin} making directory {dest}")
-            if not origin.exists():
-                dest.mkdir()
-            generate_pages_recursive(f"{origin}", template_path, f"{dest}")
-        elif origin.is_file() and origin.suffix == ".md":
-            to_file = to_path.joinpath(f"{dest.stem}.html")
-            # print(
-            #     f"found md file {origin} copying to {to_file} using templat {template_path}"
-            # )
-            generate_page(f"{origin}", template_path, f"{to_file}")
-
-
-main()
+    static_root = os.path.normpath(static_path) if static_path else None
+    index = ContentIndex.scan(dir_path_content, dest_dir_path)
+
+    def rebuild(changed: set[str]) -> None:
+        for path in sorted(changed):
+            if static_root and os.path.commonpath([static_root, path]) == static_root:
+                copy_static_file(path, static_root, dest_dir_path)
+        # only the changed sources are stat'ed again, not the whole tree
+        index.update(changed)
+        # pages show static images too; the manifest's dependency records limit
+        # this to the pages that use something that changed
+        generate_pages_recursive(
+            dir_path_content,
+            template_path,
+            dest_dir_path,
+            jobs,
+            gzip_level=gzip_level,
+            static_dir=static_path,
+            explain=True,
+            index=index,
+            drafts=drafts,
+            listings=listings,
+            site_url=site_url,
+        )
+
+    paths = [os.path.normpath(dir_path_content), os.path.normpath(template_path)]
+    if static_root and os.path.isdir(static_root):
+        paths.append(static_root)
+    print(f"Watching {', '.join(paths)} for changes")
+    try:
+        watch.watch(paths, rebuild, stop=stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def copy_static_file(path: str, static_root: str, dest_dir_path: str) -> None:
+    dest = os.path.join(dest_dir_path, os.path.relpath(path, static_root))
+    if os.path.exists(path):
+        print(f"copying {path} to {dest}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        copy_asset(path, dest)
+    elif os.path.exists(dest):
+        print(f"removing {dest}")
+        os.remove(dest)
+
+
+if __name__ == "__main__":
+    main()
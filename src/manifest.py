@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+# bump whenever a change to the generator alters the rendered output, so that
+# existing manifests are treated as stale and every page is rebuilt
+GENERATOR_VERSION = "5"
+MANIFEST_NAME = ".build-manifest.json"
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(
+        self,
+        generator_version: str = GENERATOR_VERSION,
+        pages: dict[str, dict] | None = None,
+        inputs: dict[str, dict] | None = None,
+        listings: dict[str, str] | None = None,
+    ) -> None:
+        self.generator_version = generator_version
+        # output path relative to the build dir -> record of the source it came
+        # from, plus the sha256 of the output under "output" once it is written,
+        # the other files it was built from under "deps" (path -> sha256) and
+        # the page's front matter under "meta"
+        self.pages = pages if pages is not None else {}
+        # path -> {"hash", "size", "mtime"} of every dependency other than the
+        # sources; a missing file has an empty hash
+        self.inputs = inputs if inputs is not None else {}
+        # output path -> sha256 of every listing page and feed generated from
+        # the pages' metadata, so the ones no longer generated can be removed
+        self.listings = listings if listings is not None else {}
+
+    def __eq__(self, other) -> bool:
+        return (
+            self.generator_version == other.generator_version
+            and self.pages == other.pages
+            and self.inputs == other.inputs
+            and self.listings == other.listings
+        )
+
+    def __repr__(self):
+        return (
+            f"BuildManifest({self.generator_version}, {len(self.pages)} pages, "
+            f"{len(self.inputs)} inputs)"
+        )
+
+    def compatible_with(self, other: "BuildManifest") -> bool:
+        return self.generator_version == other.generator_version
+
+    def source_record(
+        self, key: str, source_path: str, size: int, mtime_ns: int
+    ) -> dict:
+        # The hash is only recomputed when size or mtime moved, like git's
+        # index. The stat comes from the content index's directory scan.
+        record = self.pages.get(key)
+        if (
+            record is not None
+            and record["source"] == source_path
+            and record["size"] == size
+            and record["mtime"] == mtime_ns
+        ):
+            return record
+        new_record = {
+            "source": source_path,
+            "hash": hash_file(source_path),
+            "size": size,
+            "mtime": mtime_ns,
+        }
+        # a touched but unchanged source still produces the same output
+        if record is not None and record["hash"] == new_record["hash"]:
+            for field in ("output", "deps", "meta"):
+                if field in record:
+                    new_record[field] = record[field]
+        return new_record
+
+    def is_current(self, key: str, record: dict) -> bool:
+        old = self.pages.get(key)
+        return old is not None and old["hash"] == record["hash"]
+
+    def input_hash(self, path: str, previous: "BuildManifest | None" = None) -> str:
+        # Hash of a dependency, computed once per build and, like sources,
+        # only when its size or mtime moved since the previous build.
+        record = self.inputs.get(path)
+        if record is not None:
+            return record["hash"]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            record = {"hash": "", "size": -1, "mtime": 0}
+        else:
+            old = previous.inputs.get(path) if previous is not None else None
+            if (
+                old is not None
+                and old["size"] == stat.st_size
+                and old["mtime"] == stat.st_mtime_ns
+            ):
+                record = old
+            else:
+                record = {
+                    "hash": hash_file(path),
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                }
+        self.inputs[path] = record
+        return record["hash"]
+
+    @classmethod
+    def load(cls, dest_dir: str) -> "BuildManifest":
+        path = os.path.join(dest_dir, MANIFEST_NAME)
+        try:
+            with open(path, "r") as manifest_file:
+                data = json.load(manifest_file)
+            return cls(
+                data["generator"], data["pages"], data["inputs"], data["listings"]
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            # a missing or unreadable manifest simply means a full rebuild
+            return cls(generator_version="")
+
+    def save(self, dest_dir: str) -> None:
+        path = os.path.join(dest_dir, MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        data = {
+            "generator": self.generator_version,
+            "pages": self.pages,
+            "inputs": self.inputs,
+            "listings": self.listings,
+        }
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(data, manifest_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
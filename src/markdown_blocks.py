@@ -1,62 +1,177 @@
+import re
+import sys
+from typing import Iterator, TextIO
+
 from htmlnode import LeafNode, ParentNode
-from inline_markdown import text_to_textnodes
-from textnode import text_node_to_html_node
+import block_cache
+import inline_cache
+import profiler
+from inline_markdown import has_inline_markup, text_to_textnodes
+from textnode import (
+    text_node_to_html_node,
+    text_type_bold,
+    text_type_image,
+    text_type_italic,
+)
 
-block_type_paragraph = "paragraph"
-block_type_heading = "heading"
-block_type_code = "code"
-block_type_quote = "quote"
-block_type_unordered_list = "unordered list"
-block_type_ordered_list = "ordered list"
+block_type_paragraph = sys.intern("paragraph")
+block_type_heading = sys.intern("heading")
+block_type_code = sys.intern("code")
+block_type_quote = sys.intern("quote")
+block_type_unordered_list = sys.intern("unordered list")
+block_type_ordered_list = sys.intern("ordered list")
 
+_heading_tags = tuple(sys.intern(f"h{level}") for level in range(7))
+_heading_prefixes = (
+    "# ",
+    "## ",
+    "### ",
+    "#### ",
+    "##### ",
+    "###### ",
+)
 
-def block_to_block_type(block: str) -> str:
-    lines = block.splitlines()
-    if block.startswith(
-        (
-            "# ",
-            "## ",
-            "### ",
-            "#### ",
-            "##### ",
-            "###### ",
-        )
-    ):
-        return block_type_heading
+# at a line start: the line holds nothing but whitespace
+_blank_line = re.compile(r"[ \t\r\f\v]*$", re.M)
+_indent = re.compile(r"[ \t\r\f\v]*")
+
+
+# urls of the images rendered so far, while a caller has asked for them or a
+# cache entry is being made; None otherwise. Pages render on one thread per
+# process, like the active caches.
+_images: list[str] | None = None
+
+
+def _collect_images(render, *args):
+    # Calls render(*args) and returns its result with the urls of the images
+    # it rendered, which also go to whoever is collecting already.
+    global _images
+    outer = _images
+    _images = found = []
+    try:
+        result = render(*args)
+    finally:
+        _images = outer
+    if outer is not None:
+        outer.extend(found)
+    return result, found
+
+
+# "1. ", "2. ", ... built once and shared by every ordered list
+_ordinals = [""]
+
+
+def _ordinal(count: int) -> str:
+    while len(_ordinals) <= count:
+        _ordinals.append(f"{len(_ordinals)}. ")
+    return _ordinals[count]
+
+
+def line_offsets(block: str) -> list[int]:
+    # Start offset of every line of block, followed by len(block) + 1, so
+    # line i is block[offsets[i] : offsets[i + 1] - 1].
+    offsets = [0]
+    find = block.find
+    pos = find("\n")
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = find("\n", pos + 1)
+    offsets.append(len(block) + 1)
+    return offsets
+
+
+def scan_block(block: str) -> tuple[str, list[int] | None]:
+    # Classifies block without splitting it into lines. Quotes and unordered
+    # lists are recognised by counting line starts; ordered lists are walked
+    # line by line, and the offsets found on the way are returned for the
+    # converter to reuse. Offsets are None for every other type.
+    if block.startswith(_heading_prefixes):
+        return block_type_heading, None
     if block.startswith(">"):
-        for line in lines:
-            if not line.startswith(">"):
-                return block_type_paragraph
-        return block_type_quote
+        if block.count("\n>") != block.count("\n"):
+            return block_type_paragraph, None
+        return block_type_quote, None
     if block.startswith(("- ", "* ")):
-        line_start = block[:2]
-        for line in lines:
-            if line[:2] != line_start:
-                return block_type_paragraph
-        return block_type_unordered_list
+        if block.count("\n" + block[:2]) != block.count("\n"):
+            return block_type_paragraph, None
+        return block_type_unordered_list, None
     if block.startswith("1. "):
-        count = 1
-        for line in lines:
-            if not line.startswith(f"{count}. "):
-                return block_type_paragraph
-            count += 1
-        return block_type_ordered_list
+        offsets = [0]
+        find = block.find
+        pos = find("\n")
+        while pos != -1:
+            pos += 1
+            if not block.startswith(_ordinal(len(offsets) + 1), pos):
+                return block_type_paragraph, None
+            offsets.append(pos)
+            pos = find("\n", pos)
+        offsets.append(len(block) + 1)
+        return block_type_ordered_list, offsets
     if block.startswith("```") and block.endswith("```"):
-        return block_type_code
-    return block_type_paragraph
+        return block_type_code, None
+    return block_type_paragraph, None
+
+
+def block_to_block_type(block: str) -> str:
+    return scan_block(block)[0]
 
 
-def markdown_to_html_node(document: str) -> ParentNode:
-    blocks = markdown_to_blocks(document)
+def markdown_to_html_node(document: str, images: list[str] | None = None) -> ParentNode:
+    # the urls of the images on the page are added to images, when given
+    if images is None:
+        return _markdown_to_html_node(document)
+    node, found = _collect_images(_markdown_to_html_node, document)
+    images.extend(found)
+    return node
+
+
+def _markdown_to_html_node(document: str) -> ParentNode:
+    with profiler.stage("block split"):
+        spans = parse_blocks(document)
+    profiler.count("blocks", len(spans))
     children = []
-    for block in blocks:
-        html = block_to_html_node(block)
-        children.append(html)
+    with profiler.stage("block parse"):
+        cache = block_cache.active_cache()
+        for block_type, start, end, offsets in spans:
+            children.append(
+                render_block(document[start:end], block_type, cache, offsets)
+            )
     return ParentNode("div", children, None)
 
 
+def render_block(
+    block: str,
+    block_type: str,
+    cache: block_cache.BlockCache | None,
+    offsets: list[int] | None = None,
+) -> LeafNode | ParentNode:
+    # offsets are the block's line offsets as parse_blocks found them
+    if cache is None:
+        return convert_block(block, block_type, offsets)
+    # unchanged blocks of an edited page are stitched in from the cache as
+    # raw html; only new or changed blocks are parsed. The urls of the
+    # images in a block are cached with its html.
+    key = block_cache.block_key(block_type, block)
+    entry = cache.get(key)
+    if entry is None:
+        node, images = _collect_images(convert_block, block, block_type, offsets)
+        html = node.to_html()
+        cache.put(key, (html, images))
+    else:
+        html, images = entry
+        if _images is not None:
+            _images.extend(images)
+    return LeafNode(None, html)
+
+
 def block_to_html_node(block: str) -> ParentNode:
-    block_type = block_to_block_type(block)
+    block_type, offsets = scan_block(block)
+    return convert_block(block, block_type, offsets)
+
+
+def convert_block(
+    block: str, block_type: str, offsets: list[int] | None
+) -> ParentNode:
     if block_type == block_type_paragraph:
         return paragraph_block_to_html(block)
     if block_type == block_type_heading:
@@ -64,26 +179,54 @@ def block_to_html_node(block: str) -> ParentNode:
     if block_type == block_type_code:
         return code_block_to_html(block)
     if block_type == block_type_quote:
-        return quote_block_to_html(block)
+        return quote_block_to_html(block, offsets)
     if block_type == block_type_unordered_list:
-        return unord_list_block_to_html(block)
+        return unord_list_block_to_html(block, offsets)
     if block_type == block_type_ordered_list:
-        return ord_list_block_to_html(block)
+        return ord_list_block_to_html(block, offsets)
     raise Exception("unkown block type")
 
 
-def text_to_children(text: str) -> list[LeafNode]:
-    text_nodes = text_to_textnodes(text)
-    children = []
-    for node in text_nodes:
-        html = text_node_to_html_node(node)
-        children.append(html)
+def text_to_children(text: str) -> list[LeafNode | ParentNode]:
+    cache = inline_cache.active_cache()
+    if cache is None:
+        return render_inline(text)
+
+    # a hit costs one lookup; the fragment comes back as a single raw leaf,
+    # with the urls of its images
+    entry = cache.get(text)
+    if entry is None:
+        children, images = _collect_images(render_inline, text)
+        html = "".join(child.to_html() for child in children)
+        cache.put(text, (html, images))
+    else:
+        html, images = entry
+        if _images is not None:
+            _images.extend(images)
+    return [LeafNode(None, html)]
+
+
+def render_inline(text: str) -> list[LeafNode | ParentNode]:
+    with profiler.stage("inline parse"):
+        text_nodes = text_to_textnodes(text)
+        profiler.count("text nodes", len(text_nodes))
+        children = []
+        for node in text_nodes:
+            html = text_node_to_html_node(node)
+            if node.text_type == text_type_image and _images is not None:
+                _images.append(node.url)
+            if node.text_type in (
+                text_type_bold,
+                text_type_italic,
+            ) and has_inline_markup(node.text):
+                # markup nested inside bold or italic text, e.g. "**a *b* c**"
+                html = ParentNode(html.tag, render_inline(node.text))
+            children.append(html)
     return children
 
 
 def paragraph_block_to_html(block: str) -> ParentNode:
-    lines = block.split("\n")
-    paragraph = " ".join(lines)
+    paragraph = block.replace("\n", " ")
     children = text_to_children(paragraph)
     return ParentNode("p", children)
 
@@ -99,61 +242,346 @@ def heading_block_to_html(block: str) -> ParentNode:
         raise ValueError(f"Invalid heading level: {level}")
     text = block[level + 1 :]
     children = text_to_children(text)
-    return ParentNode(f"h{level}", children)
+    tag = _heading_tags[level] if level < len(_heading_tags) else f"h{level}"
+    return ParentNode(tag, children)
 
 
 def code_block_to_html(block: str) -> ParentNode:
-    if not block.startswith("```") or not block.endswith("```"):
+    if not block.startswith("```"):
         raise ValueError("Invalid code block")
-    text = block[4:-3]
+    first_end = block.find("\n")
+    if first_end == -1:
+        if len(block) >= 6 and block.endswith("```"):
+            # ```code``` on a single line
+            text = block[3:-3]
+        else:
+            # an opening fence with nothing after it yet, e.g. at the end of
+            # a file that is still being written
+            text = ""
+    else:
+        # the opening fence line, which may carry an info string, and the
+        # closing fence are dropped; an unclosed fence runs to the end
+        closing = block.rfind("\n") + 1
+        if closing > first_end and block.startswith("```", closing):
+            text = block[first_end + 1 : closing]
+        else:
+            text = block[first_end + 1 :]
     children = text_to_children(text)
     code = ParentNode("code", children)
     return ParentNode("pre", [code])
 
 
-def quote_block_to_html(block: str) -> ParentNode:
-    lines = block.splitlines()
+def quote_block_to_html(
+    block: str, offsets: list[int] | None = None
+) -> ParentNode:
+    if offsets is None:
+        offsets = line_offsets(block)
     new_lines = []
-    for line in lines:
-        if not line.startswith(">"):
+    for i in range(len(offsets) - 1):
+        start = offsets[i]
+        if not block.startswith(">", start):
             raise ValueError("Invalid quote block")
-        new_lines.append(line.lstrip(">").strip())
+        new_lines.append(block[start : offsets[i + 1] - 1].lstrip(">").strip())
     text = " ".join(new_lines)
     children = text_to_children(text)
     return ParentNode("blockquote", children)
 
 
-def unord_list_block_to_html(block: str) -> ParentNode:
-    lines = block.splitlines()
+def unord_list_block_to_html(
+    block: str, offsets: list[int] | None = None
+) -> ParentNode:
+    if offsets is None:
+        offsets = line_offsets(block)
     html_items = []
-    for line in lines:
-        text = line[2:]
+    for i in range(len(offsets) - 1):
+        text = block[offsets[i] + 2 : offsets[i + 1] - 1]
         children = text_to_children(text)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
 
-def ord_list_block_to_html(block: str) -> ParentNode:
-    lines = block.splitlines()
+def ord_list_block_to_html(
+    block: str, offsets: list[int] | None = None
+) -> ParentNode:
+    if offsets is None:
+        offsets = line_offsets(block)
     html_items = []
-    count = 1
-    for line in lines:
-        token = f"{count}. "
-        text = line[len(token) :]
+    for i in range(len(offsets) - 1):
+        marker = len(_ordinal(i + 1))
+        text = block[offsets[i] + marker : offsets[i + 1] - 1]
         children = text_to_children(text)
         html_items.append(ParentNode("li", children))
-        count += 1
     return ParentNode("ol", html_items)
 
 
 def markdown_to_blocks(text: str) -> list[str]:
-    blocks = text.split("\n\n")
-    new_nodes = []
-    for block in blocks:
-        if block == "":
+    return [text[start:end] for _, start, end, _ in parse_blocks(text)]
+
+
+def _is_fence(document: str, pos: int, line_end: int) -> bool:
+    # an info string after the backticks can't hold a backtick itself, which
+    # keeps ```code``` on one line from opening a fence
+    if not document.startswith("```", pos):
+        return False
+    return document.find("`", pos + 3, line_end) == -1
+
+
+class _BlockScanner:
+    # The line scanner behind parse_blocks. It keeps the open block between
+    # calls to scan, so a document can be fed to it in pieces, and reports
+    # each block once it is complete by calling
+    # close(block_type, start, end, fenced, lines). Offsets count from the
+    # start of the document; end is the end of the block's last line, and the
+    # callback strips the whitespace before it. For quotes and lists, lines
+    # holds the start of every line relative to the block, which the
+    # converters would otherwise have to find again.
+    __slots__ = (
+        "close",
+        "start",
+        "end",
+        "block_type",
+        "marker",
+        "count",
+        "lines",
+        "fence",
+    )
+
+    def __init__(self, close) -> None:
+        self.close = close
+        # start of the open block, -1 between blocks
+        self.start = -1
+        self.end = 0
+        self.block_type = block_type_paragraph
+        self.marker = ""
+        self.count = 0
+        self.lines: list[int] | None = None
+        # whether the open block is a fenced code block still looking for its
+        # closing fence
+        self.fence = False
+
+    def scan(self, text: str, pos: int, limit: int, base: int) -> None:
+        # Scans the lines of text from pos up to limit, where a line starts.
+        # text starts at offset base of the document.
+        close = self.close
+        find = text.find
+        startswith = text.startswith
+        blank = _blank_line.match
+        size = len(text)
+        start = self.start
+        end = self.end
+        block_type = self.block_type
+        marker = self.marker
+        count = self.count
+        lines = self.lines
+        fence = self.fence
+        while pos < limit:
+            if fence:
+                # the fence runs to the first line that starts with ```
+                if startswith("```", pos):
+                    closing = pos
+                else:
+                    closing = find("\n```", pos)
+                    if closing != -1:
+                        closing += 1
+                if closing == -1 or closing >= limit:
+                    break
+                line_end = find("\n", closing)
+                if line_end == -1:
+                    line_end = size
+                close(block_type_code, start, base + line_end, True, None)
+                start = -1
+                fence = False
+                pos = line_end + 1
+                continue
+
+            line_end = find("\n", pos)
+            if line_end == -1:
+                line_end = size
+            if line_end == pos or (text[pos] in " \t\r\f\v" and blank(text, pos)):
+                if start != -1:
+                    close(block_type, start, end, False, lines)
+                    start = -1
+                pos = line_end + 1
+                continue
+
+            first = _indent.match(text, pos).end() if start == -1 else pos
+            if _is_fence(text, first, line_end):
+                if start != -1:
+                    close(block_type, start, end, False, lines)
+                start = base + first
+                fence = True
+                pos = line_end + 1
+                continue
+
+            if start == -1:
+                start = base + first
+                count = 1
+                lines = None
+                if startswith(_heading_prefixes, first):
+                    block_type = block_type_heading
+                elif startswith(">", first):
+                    block_type = block_type_quote
+                    lines = [0]
+                elif startswith(("- ", "* "), first):
+                    block_type = block_type_unordered_list
+                    marker = text[first : first + 2]
+                    lines = [0]
+                elif startswith("1. ", first):
+                    block_type = block_type_ordered_list
+                    lines = [0]
+                elif startswith("```", first):
+                    block_type = block_type_code
+                else:
+                    block_type = block_type_paragraph
+            else:
+                # every line of a list or quote must carry its marker,
+                # otherwise the block is a paragraph
+                count += 1
+                if block_type is block_type_quote:
+                    if not startswith(">", pos):
+                        block_type = block_type_paragraph
+                elif block_type is block_type_unordered_list:
+                    if not startswith(marker, pos):
+                        block_type = block_type_paragraph
+                elif block_type is block_type_ordered_list:
+                    if not startswith(_ordinal(count), pos):
+                        block_type = block_type_paragraph
+                if lines is not None:
+                    if block_type is block_type_paragraph:
+                        lines = None
+                    else:
+                        lines.append(base + pos - start)
+            end = base + line_end
+            pos = line_end + 1
+        self.start = start
+        self.end = end
+        self.block_type = block_type
+        self.marker = marker
+        self.count = count
+        self.lines = lines
+        self.fence = fence
+
+    def finish(self, size: int) -> None:
+        # the document ends at offset size; an unclosed fence runs to it
+        if self.fence:
+            self.close(block_type_code, self.start, size, True, None)
+        elif self.start != -1:
+            self.close(self.block_type, self.start, self.end, False, self.lines)
+        self.start = -1
+        self.fence = False
+
+
+def parse_blocks(document: str) -> list[tuple[str, int, int, list[int] | None]]:
+    # Splits document into (block_type, start, end, offsets) spans in one pass
+    # over its lines, classifying each block as its lines go by. offsets are
+    # the line offsets of quotes and lists, as line_offsets would return
+    # them, and None for other blocks. Blocks are separated
+    # by blank lines, except inside a fenced code block, which runs to its
+    # closing fence, or to the end of the document if there is none. A fence
+    # also ends the paragraph before it. Spans exclude the whitespace around
+    # the block, like the strip() the old "\n\n" splitter did.
+    spans = []
+
+    def close(
+        block_type: str, start: int, end: int, fenced: bool, lines: list[int] | None
+    ) -> None:
+        while document[end - 1] in " \t\r\f\v\n":
+            end -= 1
+        # a block that merely starts with ``` is only code if it also ends so
+        if not fenced and block_type is block_type_code:
+            if not document.endswith("```", start, end):
+                block_type = block_type_paragraph
+        if lines is not None:
+            lines.append(end - start + 1)
+        spans.append((block_type, start, end, lines))
+
+    scanner = _BlockScanner(close)
+    scanner.scan(document, 0, len(document), 0)
+    scanner.finish(len(document))
+    return spans
+
+
+def iter_blocks(
+    file: TextIO, chunk_size: int = 1 << 16
+) -> Iterator[tuple[str, str, list[int] | None]]:
+    # Yields the (block_type, block, offsets) of parse_blocks(file.read()),
+    # reading the file a chunk at a time. Each chunk is scanned once, up to
+    # its last complete line; the rest is read again with the next chunk.
+    # The text of a block that spans chunks is collected in a list and
+    # joined once, when the block is complete.
+    ready: list[tuple[str, str, list[int] | None]] = []
+    # the open block's text before the current window, and where it starts
+    held: list[str] = []
+    # the current window: text, which starts at offset base of the file
+    text = ""
+    base = 0
+
+    def close(
+        block_type: str, start: int, end: int, fenced: bool, lines: list[int] | None
+    ) -> None:
+        if start >= base:
+            block = text[start - base : end - base]
+        else:
+            block = "".join(held)
+            if end > base:
+                block += text[: end - base]
+            else:
+                block = block[: end - start]
+        held.clear()
+        block = block.rstrip(" \t\r\f\v\n")
+        if not fenced and block_type is block_type_code:
+            if not block.endswith("```"):
+                block_type = block_type_paragraph
+        if lines is not None:
+            lines.append(len(block) + 1)
+        ready.append((block_type, block, lines))
+
+    scanner = _BlockScanner(close)
+    # a line that hasn't ended yet, in pieces
+    partial: list[str] = []
+    for chunk in iter(lambda: file.read(chunk_size), ""):
+        if "\n" not in chunk:
+            partial.append(chunk)
             continue
-        block = block.strip()
-        if block.endswith("\n"):
-            print("ends with new line")
-        new_nodes.append(block)
-    return new_nodes
+        partial.append(chunk)
+        text = "".join(partial)
+        limit = text.rfind("\n") + 1
+        scanner.scan(text, 0, limit, base)
+        if scanner.start != -1:
+            held.append(text[max(scanner.start - base, 0) : limit])
+        partial = [text[limit:]]
+        base += limit
+        yield from ready
+        ready.clear()
+    text = "".join(partial)
+    scanner.scan(text, 0, len(text), base)
+    scanner.finish(base + len(text))
+    yield from ready
+
+
+class StreamedDocument:
+    # Renders a markdown file like markdown_to_html_node, but converts and
+    # writes one block at a time instead of building the whole tree first.
+    def __init__(
+        self, file: TextIO, start: int = 0, images: list[str] | None = None
+    ) -> None:
+        self.file = file
+        # where the markdown starts, after any front matter
+        self.start = start
+        # filled with the urls of the images on the page as it is written
+        self.images = images
+
+    def write_html(self, out) -> None:
+        if self.images is None:
+            self._write_blocks(out)
+            return
+        _, found = _collect_images(self._write_blocks, out)
+        self.images.extend(found)
+
+    def _write_blocks(self, out) -> None:
+        self.file.seek(self.start)
+        cache = block_cache.active_cache()
+        out.write("<div>")
+        for block_type, block, offsets in iter_blocks(self.file):
+            render_block(block, block_type, cache, offsets).write_html(out)
+        out.write("</div>")
@@ -0,0 +1,126 @@
+import os
+
+from manifest import hash_bytes, hash_file
+
+WRITTEN = "written"
+SKIPPED = "skipped"
+
+
+class PageResult:
+    def __init__(
+        self,
+        dest_path: str,
+        status: str,
+        digest: str,
+        profile=None,
+        images: list[str] | None = None,
+    ) -> None:
+        self.dest_path = dest_path
+        self.status = status
+        # sha256 of the page as it is on disk now
+        self.digest = digest
+        self.profile = profile
+        # urls of the images on the page, found while rendering it
+        self.images = images if images is not None else []
+
+    def __repr__(self):
+        return f"PageResult({self.dest_path}, {self.status}, {self.digest})"
+
+
+class OutputStats:
+    def __init__(self) -> None:
+        self.written: list[str] = []
+        self.skipped: list[str] = []
+        self.deleted: list[str] = []
+        # page -> why it was rebuilt
+        self.reasons: dict[str, str] = {}
+
+    def __repr__(self):
+        return f"OutputStats({self.summary()})"
+
+    def record(self, dest_path: str, status: str) -> None:
+        if status == WRITTEN:
+            self.written.append(dest_path)
+        else:
+            self.skipped.append(dest_path)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.written)} written, {len(self.skipped)} unchanged, "
+            f"{len(self.deleted)} deleted"
+        )
+
+
+def tmp_path_for(dest_path: str) -> str:
+    head, tail = os.path.split(dest_path)
+    return os.path.join(head, f".{tail}.{os.getpid()}.tmp")
+
+
+def _same_contents(dest_path: str, size: int, digest: str) -> bool:
+    # size first, so most changed files are caught without reading them
+    try:
+        if os.path.getsize(dest_path) != size:
+            return False
+        return hash_file(dest_path) == digest
+    except OSError:
+        return False
+
+
+def write_output(dest_path: str, contents: str | bytes) -> tuple[str, str]:
+    # Writes contents to dest_path unless the file already holds exactly those
+    # bytes. Changed files are replaced atomically through a temp file and a
+    # rename. Returns (WRITTEN or SKIPPED, sha256 of the contents).
+    data = contents.encode() if isinstance(contents, str) else contents
+    digest = hash_bytes(data)
+    if _same_contents(dest_path, len(data), digest):
+        return SKIPPED, digest
+    tmp_path = tmp_path_for(dest_path)
+    try:
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return WRITTEN, digest
+
+
+class AtomicOutput:
+    # Like write_output for content that is streamed rather than built as a
+    # string: the with block writes to a temp file, which on exit either
+    # replaces dest_path or is dropped if it matches it. status and digest are
+    # set once the block exits.
+    def __init__(self, dest_path: str) -> None:
+        self.dest_path = dest_path
+        self.tmp_path = tmp_path_for(dest_path)
+        self.status = ""
+        self.digest = ""
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        return self.file
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+        if exc is not None:
+            _remove(self.tmp_path)
+            return
+        try:
+            self.digest = hash_file(self.tmp_path)
+            size = os.path.getsize(self.tmp_path)
+            if _same_contents(self.dest_path, size, self.digest):
+                self.status = SKIPPED
+                _remove(self.tmp_path)
+            else:
+                self.status = WRITTEN
+                os.replace(self.tmp_path, self.dest_path)
+        except BaseException:
+            _remove(self.tmp_path)
+            raise
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,180 @@
+import json
+import os
+import time
+
+from htmlnode import ParentNode
+
+PAGE_STAGES = (
+    "read",
+    "block split",
+    "block parse",
+    "inline parse",
+    "html serialization",
+    "templating",
+    "write",
+)
+
+# the page being profiled in this process, None when profiling is off
+_active = None
+
+
+class PageProfile:
+    def __init__(self, page: str) -> None:
+        self.page = page
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.total = 0.0
+        # seconds spent in each stage, excluding any stages nested inside it
+        self.stages = dict.fromkeys(PAGE_STAGES, 0.0)
+        self.counts: dict[str, int] = {}
+        # (stage, start, duration) of the outermost stages, for the trace
+        self.events: list[tuple[str, float, float]] = []
+        self._open: list[_Stage] = []
+
+    def __repr__(self):
+        return f"PageProfile({self.page}, {self.total:.6f}s)"
+
+
+class _Stage:
+    def __init__(self, profile: PageProfile, name: str) -> None:
+        self.profile = profile
+        self.name = name
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.profile._open.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        profile = self.profile
+        profile._open.pop()
+        profile.stages[self.name] = (
+            profile.stages.get(self.name, 0.0) + elapsed - self.nested
+        )
+        if profile._open:
+            profile._open[-1].nested += elapsed
+        else:
+            profile.events.append((self.name, self.start, elapsed))
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_stage = _NullStage()
+
+
+def stage(name: str):
+    if _active is None:
+        return _null_stage
+    return _Stage(_active, name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    if _active is not None:
+        _active.counts[name] = _active.counts.get(name, 0) + amount
+
+
+def active() -> PageProfile | None:
+    return _active
+
+
+def begin_page(page: str) -> PageProfile:
+    global _active
+    _active = PageProfile(page)
+    return _active
+
+
+def end_page() -> PageProfile:
+    global _active
+    profile = _active
+    if profile is None:
+        raise ValueError("no page is being profiled")
+    profile.total = time.perf_counter() - profile.start
+    _active = None
+    return profile
+
+
+def count_nodes(node) -> int:
+    total = 1
+    if isinstance(node, ParentNode) and node.children:
+        for child in node.children:
+            total += count_nodes(child)
+    return total
+
+
+class BuildProfile:
+    def __init__(self) -> None:
+        self.pages: list[PageProfile] = []
+
+    def add(self, profile: PageProfile) -> None:
+        self.pages.append(profile)
+
+    def stage_totals(self) -> dict[str, float]:
+        totals = dict.fromkeys(PAGE_STAGES, 0.0)
+        for page in self.pages:
+            for name, seconds in page.stages.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def summary(self, top: int = 10) -> str:
+        totals = self.stage_totals()
+        grand_total = sum(totals.values()) or 1.0
+        lines = [f"Profiled {len(self.pages)} pages", "", "Stages:"]
+        for name, seconds in sorted(totals.items(), key=lambda item: -item[1]):
+            share = seconds / grand_total * 100
+            lines.append(f"  {name:<20} {seconds * 1000:>10.2f} ms {share:>5.1f}%")
+
+        lines.extend(["", f"Slowest {min(top, len(self.pages))} pages:"])
+        slowest = sorted(self.pages, key=lambda page: -page.total)[:top]
+        for page in slowest:
+            worst = max(page.stages.items(), key=lambda item: item[1])[0]
+            nodes = page.counts.get("html nodes", 0)
+            lines.append(
+                f"  {page.total * 1000:>10.2f} ms  {page.page}"
+                f"  (mostly {worst}, {nodes} html nodes)"
+            )
+        return "\n".join(lines)
+
+    def trace_events(self) -> list[dict]:
+        # Chrome trace event format, loadable in chrome://tracing or Perfetto
+        if not self.pages:
+            return []
+        origin = min(page.start for page in self.pages)
+        events = []
+        for page in self.pages:
+            events.append(
+                {
+                    "name": page.page,
+                    "cat": "page",
+                    "ph": "X",
+                    "ts": (page.start - origin) * 1e6,
+                    "dur": page.total * 1e6,
+                    "pid": page.pid,
+                    "tid": 0,
+                    "args": {"stages": page.stages, "counts": page.counts},
+                }
+            )
+            for name, start, duration in page.events:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "stage",
+                        "ph": "X",
+                        "ts": (start - origin) * 1e6,
+                        "dur": duration * 1e6,
+                        "pid": page.pid,
+                        "tid": 0,
+                    }
+                )
+        return events
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": self.trace_events()}, trace_file)
@@ -0,0 +1,96 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Any
+
+from manifest import GENERATOR_VERSION
+
+
+class RenderCache:
+    # bounded LRU of markdown source -> what it renders to, persisted as
+    # json; the markdown renderer stores (html, urls of the images in it)
+    label = "render cache"
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        self.entries: OrderedDict[str, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # entries added since the last take_updates, to ship between
+        # processes; only kept once track_updates is called
+        self._new: dict[str, Any] | None = None
+        self._reported = (0, 0)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}({len(self.entries)}/{self.maxsize}, "
+            f"{self.hits} hits, {self.misses} misses)"
+        )
+
+    def get(self, key: str) -> Any | None:
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def put(self, key: str, html: Any) -> None:
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        if self._new is not None:
+            self._new[key] = html
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def track_updates(self) -> None:
+        self._new = {}
+        self._reported = (self.hits, self.misses)
+
+    def take_updates(self) -> tuple[dict[str, Any], int, int]:
+        new, self._new = self._new or {}, {}
+        hits = self.hits - self._reported[0]
+        misses = self.misses - self._reported[1]
+        self._reported = (self.hits, self.misses)
+        return new, hits, misses
+
+    def merge(self, updates: tuple[dict[str, Any], int, int]) -> None:
+        new, hits, misses = updates
+        for key, html in new.items():
+            self.put(key, html)
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"{self.label}: {self.hits} hits, {self.misses} misses "
+            f"({rate:.1f}% hit rate), {len(self.entries)} entries"
+        )
+
+    @classmethod
+    def load(cls, path: str, maxsize: int = 100_000) -> "RenderCache":
+        cache = cls(maxsize)
+        try:
+            with open(path, "r") as cache_file:
+                data = json.load(cache_file)
+            if data["generator"] != GENERATOR_VERSION:
+                return cache
+            for key, html in data["entries"][-maxsize:]:
+                cache.entries[key] = html
+        except (OSError, ValueError, KeyError, TypeError):
+            # a missing or unreadable cache just starts out empty
+            pass
+        return cache
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        data = {"generator": GENERATOR_VERSION, "entries": list(self.entries.items())}
+        with open(tmp_path, "w") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(tmp_path, path)
@@ -0,0 +1,54 @@
+import io
+import os
+import re
+
+_placeholder = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# template path -> (mtime_ns, compiled template)
+_templates: dict[str, tuple[int, "Template"]] = {}
+
+
+class Template:
+    def __init__(self, source: str) -> None:
+        # literal text at even indices, placeholder names at odd indices
+        self.segments = _placeholder.split(source)
+        for i in range(1, len(self.segments), 2):
+            self.segments[i] = self.segments[i].lower()
+
+    def __repr__(self):
+        return f"Template({self.segments})"
+
+    def names(self) -> list[str]:
+        return self.segments[1::2]
+
+    def render(self, values: dict) -> str:
+        out = io.StringIO()
+        self.write(out, values)
+        return out.getvalue()
+
+    def write(self, out, values: dict) -> None:
+        # placeholder names are matched case-insensitively against lowercase
+        # keys; a value can be a string or anything with write_html, such as
+        # an HTMLNode, which is streamed into out, and placeholders without a
+        # value render empty
+        segments = self.segments
+        out.write(segments[0])
+        for i in range(1, len(segments), 2):
+            value = values.get(segments[i], "")
+            if isinstance(value, str):
+                out.write(value)
+            else:
+                value.write_html(out)
+            out.write(segments[i + 1])
+
+
+def load_template(path: str) -> Template:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r") as template_file:
+        template = Template(template_file.read())
+    _templates[path] = (mtime, template)
+    return template
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from assets import copy_asset, scan_assets, sync_assets
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.write("index.css", "body { margin: 0 }")
+        self.write("images/logo.svg", "<svg></svg>")
+        self.write("images/icons/a.png", "\x89PNG" * 1000)
+
+    def write(self, relative, text):
+        path = os.path.join(self.static, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def read(self, relative):
+        with open(os.path.join(self.public, relative)) as file:
+            return file.read()
+
+    def test_scan_assets(self):
+        assets = sorted(relative for _, relative, _, _ in scan_assets(self.static))
+        self.assertEqual(assets, ["images/icons/a.png", "images/logo.svg", "index.css"])
+
+    def test_sync_copies_only_changes(self):
+        stats = sync_assets(self.static, self.public, threads=2)
+        self.assertEqual((stats.copied, stats.skipped), (3, 0))
+        self.assertEqual(stats.copied_bytes, 18 + 11 + 5000)
+        self.assertEqual(self.read("images/icons/a.png"), "\x89PNG" * 1000)
+        src = os.stat(os.path.join(self.static, "index.css"))
+        dest = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual(src.st_mtime_ns, dest.st_mtime_ns)
+
+        stats = sync_assets(self.static, self.public)
+        self.assertEqual((stats.copied, stats.skipped), (0, 3))
+        self.assertEqual(stats.skipped_bytes, 18 + 11 + 5000)
+
+        self.write("index.css", "body { margin: 1 }")
+        os.utime(os.path.join(self.static, "index.css"), ns=(0, 0))
+        stats = sync_assets(self.static, self.public)
+        self.assertEqual((stats.copied, stats.skipped), (1, 2))
+        self.assertEqual(self.read("index.css"), "body { margin: 1 }")
+
+    def test_copy_asset_replaces(self):
+        os.makedirs(self.public)
+        dest = os.path.join(self.public, "logo.svg")
+        with open(dest, "w") as file:
+            file.write("<svg>an older and longer logo</svg>")
+        copy_asset(os.path.join(self.static, "images", "logo.svg"), dest)
+        self.assertEqual(self.read("logo.svg"), "<svg></svg>")
+        self.assertEqual(os.listdir(self.public), ["logo.svg"])
+
+    def test_copy_file_range_copying_nothing(self):
+        # some filesystems answer 0 without copying, at once or part way
+        src = os.path.join(self.static, "images", "icons", "a.png")
+        dest = os.path.join(self.public, "a.png")
+        os.makedirs(self.public)
+        real_copy_file_range = getattr(os, "copy_file_range", None)
+        calls = []
+
+        def partial(src_fd, dest_fd, count):
+            calls.append(count)
+            if len(calls) == 1 and real_copy_file_range is not None:
+                return real_copy_file_range(src_fd, dest_fd, 10)
+            return 0
+
+        for fake in (mock.Mock(return_value=0), partial):
+            with mock.patch("os.copy_file_range", fake, create=True):
+                copy_asset(src, dest)
+            self.assertEqual(self.read("a.png"), "\x89PNG" * 1000)
+            os.remove(dest)
+
+
+if __name__ == "__main__":
+    unittest.main()
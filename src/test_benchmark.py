@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from benchmark import STAGES, CorpusGenerator, parse_block_mix, run_benchmark
+from markdown_blocks import (
+    block_to_block_type,
+    block_type_ordered_list,
+    block_type_quote,
+    markdown_to_blocks,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        first = CorpusGenerator(seed=3).page(0)
+        second = CorpusGenerator(seed=3).page(0)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, CorpusGenerator(seed=4).page(0))
+
+    def test_corpus_block_mix(self):
+        mix = {block_type_ordered_list: 1}
+        page = CorpusGenerator(block_mix=mix, list_length=7).page(0)
+        blocks = markdown_to_blocks(page)
+        for block in blocks[1:]:
+            self.assertEqual(block_to_block_type(block), block_type_ordered_list)
+            self.assertEqual(len(block.splitlines()), 7)
+
+    def test_corpus_link_density(self):
+        plain = CorpusGenerator(seed=1).page(0)
+        self.assertEqual(plain, CorpusGenerator(seed=1, link_density=0.0).page(0))
+        linked = CorpusGenerator(seed=1, link_density=0.5).page(0)
+        self.assertGreater(linked.count("]("), plain.count("](") + 20)
+
+    def test_write_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = CorpusGenerator().write(tmp, 5, pages_per_dir=2)
+            self.assertEqual(len(paths), 5)
+            self.assertEqual(len(os.listdir(tmp)), 3)
+
+    def test_parse_block_mix(self):
+        mix = parse_block_mix("quote=2, ordered_list=1")
+        self.assertEqual(mix, {block_type_quote: 2, block_type_ordered_list: 1})
+        self.assertRaises(ValueError, parse_block_mix, "table=1")
+
+    def test_run_benchmark(self):
+        results = run_benchmark(pages=3, blocks_per_page=5, repeat=1)
+        self.assertEqual(list(results["stages"]), [*STAGES, "build"])
+        self.assertGreater(results["corpus_bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
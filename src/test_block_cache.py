@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import inline_cache
+import markdown_blocks
+from block_cache import BlockCache, active_cache, block_key, install_cache
+from inline_cache import InlineCache
+from markdown_blocks import (
+    block_type_paragraph,
+    block_type_quote,
+    markdown_to_html_node,
+)
+
+
+class TestBlockCache(unittest.TestCase):
+    def tearDown(self):
+        install_cache(None)
+        inline_cache.install_cache(None)
+
+    def test_block_key(self):
+        key = block_key(block_type_paragraph, "> text")
+        self.assertEqual(key, block_key(block_type_paragraph, "> text"))
+        self.assertNotEqual(key, block_key(block_type_quote, "> text"))
+        self.assertNotEqual(key, block_key(block_type_paragraph, "> other"))
+
+    def test_only_changed_blocks_rendered(self):
+        page = "# Title\n\nfirst *para*\n\n* a\n* b\n\n> quote"
+        edited = page.replace("first", "edited")
+        expected = markdown_to_html_node(edited).to_html()
+
+        cache = BlockCache()
+        install_cache(cache)
+        self.assertIs(active_cache(), cache)
+        markdown_to_html_node(page)
+
+        rendered = []
+        real_convert_block = markdown_blocks.convert_block
+
+        def record(block, *args):
+            rendered.append(block)
+            return real_convert_block(block, *args)
+
+        with mock.patch("markdown_blocks.convert_block", record):
+            html = markdown_to_html_node(edited).to_html()
+        self.assertEqual(html, expected)
+        self.assertEqual(rendered, ["edited *para*"])
+        self.assertEqual((cache.hits, cache.misses), (3, 5))
+
+    def test_cached_blocks_keep_their_images(self):
+        page = "# ![logo](/logo.png)\n\ntext ![a](/a.png) `![b](/b.png)`\n\nplain"
+        expected = []
+        markdown_to_html_node(page, expected)
+        self.assertEqual(expected, ["/logo.png", "/a.png"])
+
+        for block, inline in (
+            (BlockCache(), None),
+            (BlockCache(), InlineCache()),
+            (None, InlineCache()),
+        ):
+            install_cache(block)
+            inline_cache.install_cache(inline)
+            for _ in range(2):
+                images = []
+                markdown_to_html_node(page, images)
+                self.assertEqual(images, expected)
+
+        # and after a round trip through the json file
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            inline.save(path)
+            inline_cache.install_cache(InlineCache.load(path))
+            images = []
+            markdown_to_html_node(page, images)
+            self.assertEqual(images, expected)
+            self.assertEqual(inline_cache.active_cache().hits, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import compress_outputs, gzip_path, remove_gzip
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.tmp.name, f"page{i}.html")
+            with open(path, "w") as file:
+                file.write(f"<p>page {i}</p>" * 100)
+            self.paths.append(path)
+
+    def test_compress_outputs(self):
+        self.assertEqual(compress_outputs(self.paths, level=9, threads=3), 5)
+        for path in self.paths:
+            with open(path, "rb") as page, gzip.open(gzip_path(path)) as archive:
+                self.assertEqual(archive.read(), page.read())
+        # the archives are deterministic, so recompressing writes nothing
+        mtime = os.stat(gzip_path(self.paths[0])).st_mtime_ns
+        self.assertEqual(compress_outputs(self.paths, level=9), 0)
+        self.assertEqual(os.stat(gzip_path(self.paths[0])).st_mtime_ns, mtime)
+
+    def test_remove_gzip(self):
+        compress_outputs(self.paths[:2])
+        self.assertEqual(remove_gzip(self.paths), 2)
+        self.assertFalse(os.path.exists(gzip_path(self.paths[0])))
+
+
+if __name__ == "__main__":
+    unittest.main()
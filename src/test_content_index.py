@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from content_index import ContentIndex
+
+
+class TestContentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.write("index.md", "# Home")
+        self.write("blog/post.md", "# Post\n\nbody")
+        self.write("blog/photo.png", "png")
+
+    def write(self, relative, text):
+        path = os.path.join(self.content, *relative.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_scan(self):
+        index = ContentIndex.scan(self.content + "/", self.public)
+        self.assertEqual(len(index), 2)
+        post = index.pages[os.path.join(self.content, "blog", "post.md")]
+        self.assertEqual(post.key, "blog/post.html")
+        self.assertEqual(post.dest_path, os.path.join(self.public, "blog", "post.html"))
+        self.assertEqual(post.size, len("# Post\n\nbody"))
+        self.assertEqual(
+            sorted(index.page_paths()),
+            [
+                (
+                    os.path.join(self.content, "blog", "post.md"),
+                    os.path.join(self.public, "blog", "post.html"),
+                ),
+                (
+                    os.path.join(self.content, "index.md"),
+                    os.path.join(self.public, "index.html"),
+                ),
+            ],
+        )
+
+    def test_missing_dir(self):
+        with self.assertRaises(Exception):
+            ContentIndex.scan(os.path.join(self.tmp.name, "nope"), self.public)
+
+    def test_update(self):
+        index = ContentIndex.scan(self.content, self.public)
+        index_md = os.path.join(self.content, "index.md")
+        post_md = os.path.join(self.content, "blog", "post.md")
+        new_md = self.write("docs/new.md", "# New")
+        self.write("index.md", "# Home, longer")
+        os.remove(post_md)
+        outside = os.path.join(self.tmp.name, "outside.md")
+
+        self.assertTrue(index.update({index_md, post_md, new_md, outside}))
+        self.assertEqual(
+            sorted(page.key for page in index), ["docs/new.html", "index.html"]
+        )
+        self.assertEqual(index.pages[index_md].size, len("# Home, longer"))
+        rescanned = ContentIndex.scan(self.content, self.public)
+        self.assertEqual(sorted(index.page_paths()), sorted(rescanned.page_paths()))
+        self.assertFalse(index.update({os.path.join(self.content, "blog", "a.png")}))
+
+
+if __name__ == "__main__":
+    unittest.main()
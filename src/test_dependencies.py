@@ -0,0 +1,29 @@
+import os
+import unittest
+
+from dependencies import local_asset_path
+
+
+class TestLocalAssetPath(unittest.TestCase):
+    def test_site_paths(self):
+        static = os.path.join("site", "static")
+        self.assertEqual(
+            local_asset_path("/images/a.png", static, "blog"),
+            os.path.join(static, "images", "a.png"),
+        )
+        self.assertEqual(
+            local_asset_path("a.png?v=2", static, "blog"),
+            os.path.join(static, "blog", "a.png"),
+        )
+        self.assertEqual(
+            local_asset_path("../../a.png", static, "blog"),
+            os.path.join(static, "a.png"),
+        )
+
+    def test_other_sites(self):
+        for url in ("https://x.org/a.png", "//x.org/a.png", "data:image/png,", ""):
+            self.assertIsNone(local_asset_path(url, "static", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import unittest
+
+from front_matter import read_front_matter, split_front_matter
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_yaml_like(self):
+        md = (
+            "---\n"
+            "title: Hello: world\n"
+            "date: 2024-05-01\n"
+            "tags:\n"
+            "  - python\n"
+            "  - 'static sites'\n"
+            "# a comment\n"
+            "draft: true\n"
+            "---\n"
+            "# Heading\n"
+        )
+        meta, body = split_front_matter(md)
+        self.assertEqual(
+            meta,
+            {
+                "title": "Hello: world",
+                "date": "2024-05-01",
+                "tags": ["python", "static sites"],
+                "draft": True,
+            },
+        )
+        self.assertEqual(body, "# Heading\n")
+
+    def test_toml_like(self):
+        md = '+++\ntitle = "Home"\ntags = ["a", "b"]\nweight = 3\n+++\n\nbody'
+        meta, body = split_front_matter(md)
+        self.assertEqual(
+            meta,
+            {"title": "Home", "tags": ["a", "b"], "weight": "3", "draft": False},
+        )
+        self.assertEqual(body, "\nbody")
+
+    def test_comma_separated_tags(self):
+        meta, _ = split_front_matter("---\ntags: a, b ,\n---\n")
+        self.assertEqual(meta["tags"], ["a", "b"])
+
+    def test_no_front_matter(self):
+        for md in ("# Title\n\n---\n", "---\ntitle: never closed\n", "---", ""):
+            self.assertEqual(
+                split_front_matter(md), ({"tags": [], "draft": False}, md)
+            )
+
+    def test_read_matches_split(self):
+        for md in (
+            "---\ntitle: A\n---\n# Heading\n\ntext",
+            "+++\ntitle = 'B'\n+++\nbody",
+            "---\ntitle: never closed\n\ntext",
+            "# Just markdown\n",
+        ):
+            file = io.StringIO(md)
+            meta, start = read_front_matter(file)
+            self.assertEqual((meta, file.read()), split_front_matter(md))
+            file.seek(start)
+            self.assertEqual(file.read(), split_front_matter(md)[1])
+
+    def test_read_stops_at_closing_delimiter(self):
+        file = io.StringIO("---\ntitle: A\n---\n" + "x" * 100_000)
+        read_front_matter(file)
+        self.assertEqual(file.tell(), len("---\ntitle: A\n---\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -60,6 +61,31 @@ class TestHtmlNode(unittest.TestCase):
         html = node2.to_html()
         self.assertEqual(html, expected)
 
+    def test_no_instance_dict(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("p", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_write_html_streams_chunks(self):
+        node = ParentNode(
+            "ul",
+            [
+                ParentNode("li", [LeafNode("b", "one")]),
+                ParentNode("li", [LeafNode(None, "two")]),
+            ],
+        )
+        chunks = []
+
+        class Writer:
+            def write(self, chunk):
+                chunks.append(chunk)
+
+        node.write_html(Writer())
+        expected = ["<ul>", "<li>", "<b>one</b>", "</li>", "<li>", "two", "</li>", "</ul>"]
+        self.assertEqual(chunks, expected)
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), node.to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+
+from inline_cache import InlineCache, active_cache, install_cache
+from markdown_blocks import markdown_to_html_node
+
+
+class TestInlineCache(unittest.TestCase):
+    def tearDown(self):
+        install_cache(None)
+
+    def test_lru_eviction(self):
+        cache = InlineCache(maxsize=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_save_and_load(self):
+        cache = InlineCache()
+        cache.put("*a*", "<i>a</i>")
+        cache.put("b", "b")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache.save(path)
+            loaded = InlineCache.load(path)
+            self.assertEqual(loaded.entries, cache.entries)
+            self.assertEqual(len(InlineCache.load(path, maxsize=1)), 1)
+
+            with open(path, "w") as cache_file:
+                json.dump({"generator": "old", "entries": [["b", "b"]]}, cache_file)
+            self.assertEqual(len(InlineCache.load(path)), 0)
+            self.assertEqual(len(InlineCache.load(os.path.join(tmp, "missing"))), 0)
+
+    def test_updates_between_processes(self):
+        worker = InlineCache()
+        worker.put("before", "before")
+        worker.get("before")
+        worker.track_updates()
+        worker.put("a", "A")
+        worker.get("a")
+        worker.get("x")
+        updates = worker.take_updates()
+        self.assertEqual(updates, ({"a": "A"}, 1, 1))
+        self.assertEqual(worker.take_updates(), ({}, 0, 0))
+
+        parent = InlineCache()
+        parent.merge(updates)
+        self.assertEqual(parent.entries["a"], "A")
+        self.assertEqual((parent.hits, parent.misses), (1, 1))
+
+    def test_cached_rendering_matches(self):
+        md = "* a **b** [c](/d)\n* a **b** [c](/d)\n* plain\n\na **b** [c](/d)"
+        expected = markdown_to_html_node(md).to_html()
+        cache = InlineCache()
+        install_cache(cache)
+        self.assertIs(active_cache(), cache)
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (6, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ from inline_markdown import (
     extract_markdown_links,
     split_nodes_delimiter,
     split_nodes_image,
+    split_nodes_image_link,
     split_nodes_links,
     text_to_textnodes,
 )
@@ -84,6 +85,55 @@ class TestInlineMarkdown(unittest.TestCase):
         expect = [("image", "https://image.com"), ("another", "https://another.com")]
         self.assertListEqual(links, expect)
 
+    def test_extract_links_skips_images(self):
+        text = "![image](https://image.com) and [link](https://boot.dev)"
+        links = extract_markdown_links(text)
+        self.assertListEqual(links, [("link", "https://boot.dev")])
+        images = extract_markdown_images(text)
+        self.assertListEqual(images, [("image", "https://image.com")])
+
+    def test_split_image_link(self):
+        nodes = [
+            TextNode("a [link](/l) b ![img](/i.png)[next](/n)", text_type_text),
+            TextNode("[not](/split)", text_type_bold),
+        ]
+        expect = [
+            TextNode("a ", text_type_text),
+            TextNode("link", text_type_link, "/l"),
+            TextNode(" b ", text_type_text),
+            TextNode("img", text_type_image, "/i.png"),
+            TextNode("next", text_type_link, "/n"),
+            TextNode("[not](/split)", text_type_bold),
+        ]
+        self.assertListEqual(split_nodes_image_link(nodes), expect)
+        # each kind alone leaves the other in the text
+        self.assertListEqual(split_nodes_links(split_nodes_image(nodes)), expect)
+        self.assertListEqual(
+            split_nodes_links([TextNode("![img](/i.png)", text_type_text)]),
+            [TextNode("![img](/i.png)", text_type_text)],
+        )
+
+    def test_one_grammar_for_links_and_images(self):
+        # what the page tokenizer renders as a link or image is exactly what
+        # the split_ and extract_ functions find
+        for text in (
+            "![a](b(c))",
+            "see [a](b(c)) x",
+            "[a [b]](c) ![x] [y](z)",
+            "a![b](c)[d](e)",
+        ):
+            node = TextNode(text, text_type_text)
+            nodes = text_to_textnodes(text)
+            self.assertListEqual(split_nodes_image_link([node]), nodes)
+            self.assertListEqual(
+                extract_markdown_images(text),
+                [(n.text, n.url) for n in nodes if n.text_type == text_type_image],
+            )
+            self.assertListEqual(
+                extract_markdown_links(text),
+                [(n.text, n.url) for n in nodes if n.text_type == text_type_link],
+            )
+
     def test_split_image(self):
         node = TextNode(
             "This is an image ![link](https://image.com) more text", text_type_text
@@ -267,3 +317,69 @@ class TestInlineMarkdown(unittest.TestCase):
             TextNode("link", text_type_link, "https://boot.dev"),
         ]
         self.assertListEqual(nodes, expect)
+
+    def test_split_multi_delim(self):
+        node = TextNode("a `b` c `d` e `f", text_type_text)
+        new_nodes = split_nodes_delimiter([node], "`", text_type_code)
+        expect = [
+            TextNode("a ", text_type_text),
+            TextNode("b", text_type_code),
+            TextNode(" c ", text_type_text),
+            TextNode("d", text_type_code),
+            TextNode(" e `f", text_type_text),
+        ]
+        self.assertListEqual(new_nodes, expect)
+
+    def test_text_to_textnodes_multiple_pairs(self):
+        nodes = text_to_textnodes("*a* and *b*, `c` and `d`")
+        expect = [
+            TextNode("a", text_type_italic),
+            TextNode(" and ", text_type_text),
+            TextNode("b", text_type_italic),
+            TextNode(", ", text_type_text),
+            TextNode("c", text_type_code),
+            TextNode(" and ", text_type_text),
+            TextNode("d", text_type_code),
+        ]
+        self.assertListEqual(nodes, expect)
+
+    def test_text_to_textnodes_nested(self):
+        nodes = text_to_textnodes("x **bold *it* bold** y *it **b** it*")
+        expect = [
+            TextNode("x ", text_type_text),
+            TextNode("bold *it* bold", text_type_bold),
+            TextNode(" y ", text_type_text),
+            TextNode("it **b** it", text_type_italic),
+        ]
+        self.assertListEqual(nodes, expect)
+
+    def test_text_to_textnodes_code_is_literal(self):
+        nodes = text_to_textnodes("`a *b* [c](d)` **e `*` f**")
+        expect = [
+            TextNode("a *b* [c](d)", text_type_code),
+            TextNode(" ", text_type_text),
+            TextNode("e `*` f", text_type_bold),
+        ]
+        self.assertListEqual(nodes, expect)
+
+    def test_text_to_textnodes_unclosed(self):
+        nodes = text_to_textnodes("2 * 3 = 6, a [b] and ![c]")
+        expect = [TextNode("2 * 3 = 6, a [b] and ![c]", text_type_text)]
+        self.assertListEqual(nodes, expect)
+        self.assertListEqual(text_to_textnodes(""), [TextNode("", text_type_text)])
+
+    def test_text_to_textnodes_deeply_nested_stars(self):
+        # every run of stars opens another span inside the last one; no text
+        # is lost however deep that goes
+        marks = {text_type_text: "", text_type_italic: "*", text_type_bold: "**"}
+        for text in ("a * b ** c " * 500, "x **y *z " * 1000, "ls *.md **/*.py " * 500):
+            nodes = text_to_textnodes(text)
+            rebuilt = "".join(
+                f"{marks[node.text_type]}{node.text}{marks[node.text_type]}"
+                for node in nodes
+            )
+            self.assertEqual(rebuilt, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from io_pipeline import BackgroundWriter, prefetch, read_file
+
+
+class TestIOPipeline(unittest.TestCase):
+    def test_prefetch_in_order_and_bounded(self):
+        lock = threading.Lock()
+        started = []
+        in_flight = [0, 0]
+
+        def read(path):
+            with lock:
+                started.append(path)
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            return path.upper()
+
+        paths = [f"page{i}" for i in range(20)]
+        results = []
+        for path, contents in prefetch(paths, threads=4, depth=3, read=read):
+            # nothing is read more than depth pages ahead of the current one
+            self.assertLessEqual(len(started), len(results) + 1 + 3)
+            results.append((path, contents))
+        self.assertEqual(results, [(path, path.upper()) for path in paths])
+        self.assertLessEqual(in_flight[1], 3)
+
+    def test_prefetch_reads_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.md")
+            with open(path, "w") as file:
+                file.write("# a")
+            self.assertEqual(list(prefetch([path])), [(path, "# a")])
+            self.assertEqual(read_file(path), "# a")
+
+    def test_background_writer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"{i}.html") for i in range(10)]
+            with BackgroundWriter(threads=2, max_pending=2) as writer:
+                for i, path in enumerate(paths):
+                    writer.submit(path, f"<p>{i}</p>")
+            for i, path in enumerate(paths):
+                self.assertEqual(read_file(path), f"<p>{i}</p>")
+
+    def test_background_writer_error(self):
+        def write(path, contents):
+            raise OSError(f"cannot write {path}")
+
+        writer = BackgroundWriter(write=write)
+        writer.submit("a.html", "")
+        with self.assertRaises(OSError):
+            writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import datetime
+import unittest
+
+from listings import atom_date, atom_feed, build_listings, sort_entries, tag_slug
+from template import Template
+
+
+def meta(title, date="", tags=()):
+    page = {"title": title, "tags": list(tags), "draft": False}
+    if date:
+        page["date"] = date
+    return page
+
+
+class TestListings(unittest.TestCase):
+    def setUp(self):
+        self.template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        self.entries = sort_entries(
+            [
+                ("index.html", meta("Home")),
+                ("blog/b.html", meta("B", "2024-02-01", ["Python"])),
+                ("blog/a.html", meta("A <1>", "2024-03-01", ["python", "Web Dev"])),
+                ("blog/c.html", meta("C")),
+                ("blog/index.html", meta("Blog", "2023-01-01")),
+            ]
+        )
+
+    def test_sort_entries(self):
+        self.assertEqual(
+            [entry.key for entry in self.entries],
+            [
+                "blog/a.html",
+                "blog/b.html",
+                "blog/index.html",
+                "blog/c.html",
+                "index.html",
+            ],
+        )
+        self.assertEqual(self.entries[2].url(), "/blog/")
+        self.assertEqual(self.entries[4].url(), "/")
+
+    def test_sort_parsed_dates(self):
+        entries = sort_entries(
+            [
+                ("a.html", meta("A", "2024-10-01")),
+                ("b.html", meta("B", "2024-5-1")),
+                ("c.html", meta("C", "someday")),
+                ("d.html", meta("D")),
+                ("e.html", meta("E", "2024-10-01T12:00:00+02:00")),
+            ]
+        )
+        self.assertEqual(
+            [entry.key for entry in entries],
+            ["e.html", "a.html", "b.html", "c.html", "d.html"],
+        )
+        feed = atom_feed(entries, "https://example.com", "Site")
+        self.assertIn("<updated>2024-05-01T00:00:00+00:00</updated>", feed)
+        self.assertNotIn("c.html", feed)
+
+    def test_tag_slug(self):
+        self.assertEqual(tag_slug("Web Dev"), "web-dev")
+        self.assertEqual(tag_slug("C++"), "c")
+        self.assertEqual(tag_slug("!!"), "tag")
+
+    def test_build_listings(self):
+        listings = build_listings(self.entries, {"index.html"}, self.template)
+        self.assertEqual(
+            sorted(listings),
+            [
+                "blog/index.html",
+                "tags/index.html",
+                "tags/python/index.html",
+                "tags/web-dev/index.html",
+            ],
+        )
+        self.assertEqual(
+            listings["tags/python/index.html"],
+            "<h1>Tagged python</h1><div><ul>"
+            '<li><a href= "/blog/a.html">A &lt;1&gt;</a> <time>2024-03-01</time></li>'
+            '<li><a href= "/blog/b.html">B</a> <time>2024-02-01</time></li>'
+            "</ul></div>",
+        )
+        self.assertIn(
+            '<a href= "/tags/python/">python</a> (2)', listings["tags/index.html"]
+        )
+        # a section with an index page of its own keeps it
+        listings = build_listings(self.entries, {"blog/index.html"}, self.template)
+        self.assertNotIn("blog/index.html", listings)
+
+    def test_pagination(self):
+        start = datetime.date(2024, 1, 1)
+        entries = sort_entries(
+            [
+                (
+                    f"notes/{i:02}.html",
+                    meta(f"Note {i}", str(start + datetime.timedelta(days=i))),
+                )
+                for i in range(1, 46)
+            ]
+        )
+        listings = build_listings(entries, set(), self.template)
+        self.assertEqual(
+            sorted(listings),
+            ["notes/index.html", "notes/page/2/index.html", "notes/page/3/index.html"],
+        )
+        first = listings["notes/index.html"]
+        self.assertEqual(first.count("<li>"), 20)
+        self.assertIn("Note 45", first)
+        self.assertIn('<nav><a href= "/notes/page/2/">Older</a></nav>', first)
+        last = listings["notes/page/3/index.html"]
+        self.assertEqual(last.count("<li>"), 5)
+        self.assertIn("<h1>notes, page 3</h1>", last)
+        self.assertIn('<nav><a href= "/notes/page/2/">Newer</a></nav>', last)
+
+    def test_atom_feed(self):
+        feed = atom_feed(self.entries, "https://example.com/", "Site", size=2)
+        self.assertIn("<updated>2024-03-01T00:00:00+00:00</updated>", feed)
+        self.assertEqual(feed.count("<entry>"), 2)
+        self.assertIn("<id>https://example.com/blog/a.html</id>", feed)
+        self.assertIn("<title>A &lt;1&gt;</title>", feed)
+        self.assertIn('<category term="Web Dev"/>', feed)
+        self.assertNotIn("blog/c.html", feed)
+        self.assertEqual(
+            feed, atom_feed(self.entries, "https://example.com", "Site", 2)
+        )
+
+    def test_atom_date(self):
+        self.assertEqual(atom_date("2024-05-01"), "2024-05-01T00:00:00+00:00")
+        self.assertEqual(
+            atom_date("2024-05-01T10:30:00+02:00"), "2024-05-01T10:30:00+02:00"
+        )
+        self.assertEqual(atom_date("2024-5-1"), "2024-05-01T00:00:00+00:00")
+        self.assertIsNone(atom_date("May 1st"))
+        self.assertIsNone(atom_date("2024-13-40"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,371 @@
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+import profiler
+from inline_cache import InlineCache
+from manifest import MANIFEST_NAME, BuildManifest
+
+
+class TestGeneratePagesRecursive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nbody")
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, **kwargs):
+        generated = []
+        real_generate_page = main.generate_page
+
+        def record(from_path, template_path, dest_path, *args):
+            generated.append(os.path.relpath(dest_path, self.public))
+            return real_generate_page(from_path, template_path, dest_path, *args)
+
+        with mock.patch("main.generate_page", record):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.stats = main.generate_pages_recursive(
+                    self.content, self.template, self.public, **kwargs
+                )
+        return sorted(generated)
+
+    def test_full_build(self):
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+        with open(os.path.join(self.public, "blog", "post.html")) as file:
+            self.assertEqual(
+                file.read(), "<title>Post</title><div><h1>Post</h1><p>body</p></div>"
+            )
+        manifest = BuildManifest.load(self.public)
+        self.assertEqual(sorted(manifest.pages), ["blog/post.html", "index.html"])
+
+    def test_rebuild_only_changed(self):
+        self.build()
+        self.assertEqual(self.build(), [])
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged")
+        self.assertEqual(self.build(), ["index.html"])
+
+    def test_template_change_rebuilds_all(self):
+        self.build()
+        self.write(self.template, "{{ Content }}")
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+
+    def test_rebuild_reasons(self):
+        self.build()
+        self.write(self.template, "{{ Content }}")
+        self.build()
+        post = os.path.join(self.public, "blog", "post.html")
+        self.assertEqual(
+            self.stats.reasons[post], f"{os.path.normpath(self.template)} changed"
+        )
+        source = os.path.join(self.content, "blog", "post.md")
+        self.write(source, "# Post")
+        self.build()
+        self.assertEqual(self.stats.reasons, {post: f"{source} changed"})
+
+    def test_image_change_rebuilds_pages_using_it(self):
+        static = os.path.join(self.tmp.name, "static")
+        logo = os.path.join(static, "images", "logo.png")
+        self.write(logo, "v1")
+        self.write(
+            os.path.join(self.content, "blog", "post.md"),
+            "# Post\n\n![logo](/images/logo.png) ![remote](https://x.org/a.png)",
+        )
+        self.write(
+            os.path.join(self.content, "index.md"), "# Home\n\n![logo](images/logo.png)"
+        )
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        self.build(static_dir=static)
+        self.assertEqual(self.build(static_dir=static), [])
+
+        self.write(logo, "v2")
+        self.assertEqual(self.build(static_dir=static), ["blog/post.html", "index.html"])
+        self.assertEqual(
+            set(self.stats.reasons.values()), {f"{os.path.normpath(logo)} changed"}
+        )
+        os.remove(logo)
+        self.build(static_dir=static)
+        self.assertEqual(
+            set(self.stats.reasons.values()), {f"{os.path.normpath(logo)} was removed"}
+        )
+        self.assertEqual(self.build(static_dir=static), [])
+
+    def test_image_dependencies_from_every_renderer(self):
+        static = os.path.join(self.tmp.name, "static")
+        logo = os.path.join(static, "images", "logo.png")
+        self.write(logo, "v1")
+        self.write(
+            os.path.join(self.content, "blog", "post.md"),
+            "---\ntitle: Post\n---\n# Post\n\n![logo](../images/logo.png)\n\n"
+            "![remote](https://x.org/a.png)",
+        )
+        expected = sorted([os.path.normpath(self.template), os.path.normpath(logo)])
+        for threshold, kwargs in (
+            (main.STREAM_THRESHOLD, {}),
+            (0, {}),
+            (main.STREAM_THRESHOLD, {"io_threads": 2}),
+            (main.STREAM_THRESHOLD, {"jobs": 2}),
+        ):
+            with mock.patch("main.STREAM_THRESHOLD", threshold):
+                self.build(static_dir=static, **kwargs)
+            manifest = BuildManifest.load(self.public)
+            self.assertEqual(sorted(manifest.pages["blog/post.html"]["deps"]), expected)
+            os.remove(os.path.join(self.public, MANIFEST_NAME))
+
+    def test_front_matter(self):
+        self.write(self.template, "{{ Title }}|{{ Date }}|{{ Tags }}|{{ Content }}")
+        self.write(
+            os.path.join(self.content, "blog", "post.md"),
+            "---\ntitle: From front matter\ndate: 2024-05-01\ntags: [a, b]\n---\n"
+            "# Post\n\nbody",
+        )
+        expected = "From front matter|2024-05-01|a, b|<div><h1>Post</h1><p>body</p></div>"
+        for threshold in (main.STREAM_THRESHOLD, 0):
+            with mock.patch("main.STREAM_THRESHOLD", threshold):
+                self.build()
+            with open(os.path.join(self.public, "blog", "post.html")) as file:
+                self.assertEqual(file.read(), expected)
+            os.remove(os.path.join(self.public, MANIFEST_NAME))
+
+        self.build()
+        manifest = BuildManifest.load(self.public)
+        self.assertEqual(
+            manifest.pages["blog/post.html"]["meta"],
+            {
+                "title": "From front matter",
+                "date": "2024-05-01",
+                "tags": ["a", "b"],
+                "draft": False,
+            },
+        )
+        self.assertEqual(manifest.pages["index.html"]["meta"]["title"], "Home")
+        # unchanged pages keep their metadata without the source being read
+        with mock.patch("main.load_page_metadata") as load:
+            self.build()
+        load.assert_not_called()
+
+    def test_drafts_skipped(self):
+        post = os.path.join(self.public, "blog", "post.html")
+        self.build()
+        self.write(
+            os.path.join(self.content, "blog", "post.md"),
+            "---\ndraft: true\n---\n# Post\n\nunfinished",
+        )
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(post))
+        self.assertEqual(self.stats.deleted, [post])
+        manifest = BuildManifest.load(self.public)
+        self.assertTrue(manifest.pages["blog/post.html"]["meta"]["draft"])
+
+        self.assertEqual(self.build(drafts=True), ["blog/post.html"])
+        self.assertEqual(self.build(drafts=True), [])
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(post))
+
+    def test_listings(self):
+        self.write(
+            os.path.join(self.content, "blog", "post.md"),
+            "---\ndate: 2024-05-01\ntags: [news]\n---\n# Post",
+        )
+        self.write(
+            os.path.join(self.content, "blog", "draft.md"),
+            "---\ndate: 2024-06-01\ntags: [news, wip]\ndraft: true\n---\n# Draft",
+        )
+        news = os.path.join(self.public, "tags", "news", "index.html")
+        self.build(listings=True, site_url="https://example.com/")
+        with open(os.path.join(self.public, "blog", "index.html")) as file:
+            blog = file.read()
+        self.assertIn('href= "/blog/post.html"', blog)
+        self.assertNotIn("Draft", blog)
+        self.assertTrue(os.path.exists(news))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "tags", "wip")))
+        with open(os.path.join(self.public, "feed.xml")) as file:
+            self.assertIn("<id>https://example.com/blog/post.html</id>", file.read())
+        manifest = BuildManifest.load(self.public)
+        self.assertEqual(
+            sorted(manifest.listings),
+            ["blog/index.html", "feed.xml", "tags/index.html", "tags/news/index.html"],
+        )
+
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.build(listings=True)
+        self.assertFalse(os.path.exists(news))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "feed.xml")))
+        self.assertEqual(BuildManifest.load(self.public).listings, {})
+
+    def test_missing_output_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.assertEqual(self.build(), ["index.html"])
+
+    def test_deleted_source_removed(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+        manifest = BuildManifest.load(self.public)
+        self.assertEqual(list(manifest.pages), ["index.html"])
+
+    def test_corrupt_manifest_rebuilds_all(self):
+        self.build()
+        self.write(os.path.join(self.public, MANIFEST_NAME), "{not json")
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+
+    def test_parallel_build_matches_serial(self):
+        for i in range(8):
+            self.write(
+                os.path.join(self.content, "docs", f"page{i}.md"),
+                f"# Page {i}\n\n* item **{i}**\n* other\n\n> quote {i}",
+            )
+        serial = os.path.join(self.tmp.name, "serial")
+        parallel = os.path.join(self.tmp.name, "parallel")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, serial)
+            main.generate_pages_recursive(self.content, self.template, parallel, 4)
+
+        serial_pages = main.find_pages(self.content, serial)
+        self.assertEqual(len(serial_pages), 10)
+        for _, serial_path in serial_pages:
+            parallel_path = os.path.join(parallel, os.path.relpath(serial_path, serial))
+            with open(serial_path, "rb") as a, open(parallel_path, "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_profiled_build_matches_streamed_build(self):
+        streamed = os.path.join(self.tmp.name, "streamed")
+        profiled = os.path.join(self.tmp.name, "profiled")
+        build_profile = profiler.BuildProfile()
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, streamed)
+            main.generate_pages_recursive(
+                self.content, self.template, profiled, 1, build_profile
+            )
+
+        self.assertEqual(len(build_profile.pages), 2)
+        for page in build_profile.pages:
+            self.assertGreater(page.counts["html nodes"], 0)
+        for name in ("index.html", os.path.join("blog", "post.html")):
+            with open(os.path.join(streamed, name)) as a:
+                with open(os.path.join(profiled, name)) as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_streamed_build_matches_in_memory_build(self):
+        in_memory = os.path.join(self.tmp.name, "in_memory")
+        streamed = os.path.join(self.tmp.name, "streamed")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, in_memory)
+            with mock.patch("main.STREAM_THRESHOLD", 0):
+                main.generate_pages_recursive(self.content, self.template, streamed)
+
+        for name in ("index.html", os.path.join("blog", "post.html")):
+            with open(os.path.join(in_memory, name)) as a:
+                with open(os.path.join(streamed, name)) as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_inline_cache_shared_across_workers(self):
+        for i in range(4):
+            self.write(
+                os.path.join(self.content, "docs", f"page{i}.md"),
+                f"# Page {i}\n\n* [Home](/) **shared**\n* item {i}",
+            )
+        serial = os.path.join(self.tmp.name, "serial")
+        cached = os.path.join(self.tmp.name, "cached")
+        inline_cache = InlineCache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, serial)
+            main.generate_pages_recursive(
+                self.content, self.template, cached, 3, None, inline_cache
+            )
+
+        self.assertIn("[Home](/) **shared**", inline_cache.entries)
+        self.assertEqual(inline_cache.hits + inline_cache.misses, 16)
+        for _, serial_path in main.find_pages(self.content, serial):
+            cached_path = os.path.join(cached, os.path.relpath(serial_path, serial))
+            with open(serial_path) as a, open(cached_path) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_pipelined_build_matches_serial(self):
+        for i in range(6):
+            self.write(os.path.join(self.content, f"page{i}.md"), f"# P{i}\n\n*{i}*")
+        serial = os.path.join(self.tmp.name, "serial")
+        pipelined = os.path.join(self.tmp.name, "pipelined")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, serial)
+            main.generate_pages_recursive(
+                self.content, self.template, pipelined, io_threads=3
+            )
+
+        serial_pages = main.find_pages(self.content, serial)
+        self.assertEqual(len(serial_pages), 8)
+        for _, serial_path in serial_pages:
+            path = os.path.join(pipelined, os.path.relpath(serial_path, serial))
+            with open(serial_path) as a, open(path) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_unchanged_output_not_rewritten(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = main.generate_pages_recursive(
+                self.content, self.template, self.public
+            )
+            self.assertEqual(len(stats.written), 2)
+            index = os.path.join(self.public, "index.html")
+            mtime = os.stat(index).st_mtime_ns
+            # a template change that doesn't alter the html rebuilds every
+            # page but writes none of them
+            self.write(self.template, "<title>{{Title}}</title>{{Content}}")
+            os.remove(os.path.join(self.content, "blog", "post.md"))
+            stats = main.generate_pages_recursive(
+                self.content, self.template, self.public
+            )
+        self.assertEqual(stats.written, [])
+        self.assertEqual(stats.skipped, [index])
+        self.assertEqual(len(stats.deleted), 1)
+        self.assertEqual(os.stat(index).st_mtime_ns, mtime)
+        manifest = BuildManifest.load(self.public)
+        self.assertEqual(len(manifest.pages["index.html"]["output"]), 64)
+
+    def test_gzip_only_changed_pages(self):
+        index_gz = os.path.join(self.public, "index.html.gz")
+        post_gz = os.path.join(self.public, "blog", "post.html.gz")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(self.content, self.template, self.public)
+            self.assertFalse(os.path.exists(index_gz))
+            # turning compression on covers pages that were already built
+            main.generate_pages_recursive(
+                self.content, self.template, self.public, gzip_level=9
+            )
+            with gzip.open(index_gz, "rt") as archive:
+                with open(os.path.join(self.public, "index.html")) as page:
+                    self.assertEqual(archive.read(), page.read())
+            post_mtime = os.stat(post_gz).st_mtime_ns
+
+            self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged")
+            main.generate_pages_recursive(
+                self.content, self.template, self.public, gzip_level=9
+            )
+            with gzip.open(index_gz, "rt") as archive:
+                self.assertIn("changed", archive.read())
+            self.assertEqual(os.stat(post_gz).st_mtime_ns, post_mtime)
+
+            # a page rebuilt without compression loses its stale archive
+            self.write(os.path.join(self.content, "index.md"), "# Home\n\nagain")
+            main.generate_pages_recursive(self.content, self.template, self.public)
+        self.assertFalse(os.path.exists(index_gz))
+        self.assertTrue(os.path.exists(post_gz))
+
+
+if __name__ == "__main__":
+    unittest.main()
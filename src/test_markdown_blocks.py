@@ -1,6 +1,9 @@
+import io
 import unittest
+from unittest import mock
 
 from markdown_blocks import (
+    StreamedDocument,
     block_to_block_type,
     block_type_code,
     block_type_heading,
@@ -8,8 +11,12 @@ from markdown_blocks import (
     block_type_paragraph,
     block_type_quote,
     block_type_unordered_list,
+    iter_blocks,
+    line_offsets,
     markdown_to_blocks,
     markdown_to_html_node,
+    parse_blocks,
+    scan_block,
 )
 
 
@@ -71,6 +78,17 @@ This is the same paragraph on a new line
         block = "paragraph"
         self.assertEqual(block_to_block_type(block), block_type_paragraph)
 
+    def test_scan_block(self):
+        block = "1. one\n2. two\n3. three"
+        block_type, offsets = scan_block(block)
+        self.assertEqual(block_type, block_type_ordered_list)
+        self.assertEqual(offsets, [0, 7, 14, len(block) + 1])
+        lines = [block[a : b - 1] for a, b in zip(offsets, offsets[1:])]
+        self.assertEqual(lines, block.splitlines())
+        self.assertEqual(scan_block("1. one\n3. two"), (block_type_paragraph, None))
+        self.assertEqual(scan_block("> a\nb"), (block_type_paragraph, None))
+        self.assertEqual(scan_block("* a\n- b"), (block_type_paragraph, None))
+
     def test_paragraph(self):
         md = """
 This is **bolded** paragraph
@@ -154,6 +172,124 @@ this is paragraph text
             "<div><blockquote>This is a blockquote block</blockquote><p>this is paragraph text</p></div>",
         )
 
+    def test_nested_inline(self):
+        md = "**bold *italic* `code`** and *it **b***"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><p><b>bold <i>italic</i> <code>code</code></b> and <i>it <b>b</b></i></p></div>",
+        )
+
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        documents = [
+            "\n# heading\n\npara\ngraph\n\n\n\n\n* a\n* b\n",
+            "a\n\n\nb\n\n   \n\nc\n\n\n",
+            "\n\n\n",
+            "",
+            "single block without separators",
+            "text\n```py\na\n\n\nb\n```\n\n* x\n```\nunclosed\n\n",
+            # blocks and lines that span many chunks
+            "x" * 1000 + "\n" + "- item\n" * 200 + "\n```\n" + "code\n\n" * 200,
+        ]
+        for document in documents:
+            expected = [
+                (block_type, document[start:end], offsets)
+                for block_type, start, end, offsets in parse_blocks(document)
+            ]
+            for chunk_size in (1, 2, 3, 7, 1 << 16):
+                blocks = list(iter_blocks(io.StringIO(document), chunk_size))
+                self.assertEqual(blocks, expected)
+
+    def test_parse_blocks(self):
+        md = "  # title\n\n* a\n* b\n   \n1. x\n3. y\n\n```\ncode\n```   \n"
+        spans = parse_blocks(md)
+        self.assertEqual(
+            [(block_type, md[start:end]) for block_type, start, end, _ in spans],
+            [
+                (block_type_heading, "# title"),
+                (block_type_unordered_list, "* a\n* b"),
+                (block_type_paragraph, "1. x\n3. y"),
+                (block_type_code, "```\ncode\n```"),
+            ],
+        )
+
+    def test_parse_blocks_line_offsets(self):
+        md = "> a\n> b  \n\n- x\n- yy\n\n1. one\n2. two\n\n> a\nb\n\n# h"
+        spans = parse_blocks(md)
+        self.assertEqual(
+            [offsets for _, _, _, offsets in spans],
+            [[0, 4, 8], [0, 4, 9], [0, 7, 14], None, None],
+        )
+        for _, start, end, offsets in spans[:3]:
+            self.assertEqual(offsets, line_offsets(md[start:end]))
+        # the converters use them instead of looking for the lines again
+        with mock.patch("markdown_blocks.line_offsets", side_effect=AssertionError):
+            html = markdown_to_html_node(md).to_html()
+            out = io.StringIO()
+            StreamedDocument(io.StringIO(md)).write_html(out)
+        self.assertIn("<blockquote>a b</blockquote>", html)
+        self.assertEqual(out.getvalue(), html)
+
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "intro\n```python\ndef f():\n\n    return 1\n```\nafter"
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["intro", "```python\ndef f():\n\n    return 1\n```", "after"],
+        )
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><p>intro</p><pre><code>def f():\n\n    return 1\n</code></pre>"
+            "<p>after</p></div>",
+        )
+
+    def test_code_full_of_stars(self):
+        # the stars nest as deep as the block is long
+        code = "x = a * b ** c\n" * 500
+        html = markdown_to_html_node(f"```\n{code}```").to_html()
+        self.assertTrue(html.startswith("<div><pre><code>x = a "))
+        self.assertTrue(html.endswith(" c\n</code></pre></div>"))
+
+    def test_unclosed_fence_runs_to_end(self):
+        md = "```\nopen\n\n# not a heading\n"
+        self.assertEqual(markdown_to_blocks(md), ["```\nopen\n\n# not a heading"])
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>open\n\n# not a heading</code></pre></div>",
+        )
+        # a fence with nothing after it is empty code
+        for md, before in (
+            ("a\n```\n", "<p>a</p>"),
+            ("para\n\n```", "<p>para</p>"),
+            ("```", ""),
+            ("```python", ""),
+        ):
+            self.assertEqual(
+                markdown_to_html_node(md).to_html(),
+                f"<div>{before}<pre><code></code></pre></div>",
+            )
+
+    def test_images_from_rendered_nodes(self):
+        md = (
+            "![a](/a.png) and `![not](/code-span.png)`\n\n"
+            "**bold ![b](b.png)**\n\n"
+            "- ![c](/c.png)\n\n"
+            "[a link](/page.html) ![x](y(z))"
+        )
+        images = []
+        html = markdown_to_html_node(md, images).to_html()
+        self.assertEqual(images, ["/a.png", "b.png", "/c.png"])
+        self.assertEqual(html.count("<img "), 3)
+        streamed = []
+        StreamedDocument(io.StringIO(md), images=streamed).write_html(io.StringIO())
+        self.assertEqual(streamed, images)
+
+    def test_streamed_document(self):
+        md = "# title\n\nsome **bold** text\n\n1. one\n2. two\n\n> quote"
+        out = io.StringIO()
+        StreamedDocument(io.StringIO(md)).write_html(out)
+        self.assertEqual(out.getvalue(), markdown_to_html_node(md).to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
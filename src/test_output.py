@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from manifest import hash_bytes
+from output import SKIPPED, WRITTEN, AtomicOutput, write_output
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "page.html")
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read()
+
+    def test_write_output_skips_identical(self):
+        self.assertEqual(
+            write_output(self.path, "<p>a</p>"), (WRITTEN, hash_bytes(b"<p>a</p>"))
+        )
+        mtime = os.stat(self.path).st_mtime_ns
+        self.assertEqual(write_output(self.path, "<p>a</p>")[0], SKIPPED)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+        # same size, different bytes
+        self.assertEqual(write_output(self.path, "<p>b</p>")[0], WRITTEN)
+        self.assertEqual(self.read(), "<p>b</p>")
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+    def test_atomic_output(self):
+        output = AtomicOutput(self.path)
+        with output as file:
+            file.write("<p>")
+            file.write("a</p>")
+        self.assertEqual(output.status, WRITTEN)
+        self.assertEqual(output.digest, hash_bytes(b"<p>a</p>"))
+
+        output = AtomicOutput(self.path)
+        with output as file:
+            file.write("<p>a</p>")
+        self.assertEqual(output.status, SKIPPED)
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+    def test_failed_write_leaves_old_file(self):
+        write_output(self.path, "<p>old</p>")
+        with self.assertRaises(ValueError):
+            with AtomicOutput(self.path) as file:
+                file.write("<p>half")
+                raise ValueError("render failed")
+        self.assertEqual(self.read(), "<p>old</p>")
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import profiler
+from htmlnode import LeafNode, ParentNode
+from markdown_blocks import markdown_to_html_node
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        if profiler.active() is not None:
+            profiler.end_page()
+
+    def test_inactive_stage_is_noop(self):
+        self.assertIsNone(profiler.active())
+        with profiler.stage("read"):
+            profiler.count("blocks")
+        self.assertIsNone(profiler.active())
+
+    def test_nested_stages_are_exclusive(self):
+        profiler.begin_page("page.md")
+        with profiler.stage("block parse"):
+            time.sleep(0.01)
+            with profiler.stage("inline parse"):
+                time.sleep(0.02)
+        page = profiler.end_page()
+
+        self.assertGreaterEqual(page.stages["inline parse"], 0.02)
+        self.assertGreaterEqual(page.stages["block parse"], 0.01)
+        self.assertLess(page.stages["block parse"], 0.02)
+        self.assertEqual([event[0] for event in page.events], ["block parse"])
+        self.assertIsNone(profiler.active())
+
+    def test_markdown_stages_and_counts(self):
+        profiler.begin_page("page.md")
+        markdown_to_html_node("# title\n\n* a *b*\n* c")
+        page = profiler.end_page()
+        self.assertEqual(page.counts["blocks"], 2)
+        self.assertEqual(page.counts["text nodes"], 4)
+        for stage in ("block split", "block parse", "inline parse"):
+            self.assertGreater(page.stages[stage], 0)
+
+    def test_count_nodes(self):
+        node = ParentNode("ul", [ParentNode("li", [LeafNode(None, "a")])])
+        self.assertEqual(profiler.count_nodes(node), 3)
+
+    def test_build_profile_summary_and_trace(self):
+        build = profiler.BuildProfile()
+        for name in ("fast.md", "slow.md"):
+            profiler.begin_page(name)
+            with profiler.stage("read"):
+                time.sleep(0.01 if name == "slow.md" else 0)
+            build.add(profiler.end_page())
+
+        summary = build.summary(1)
+        self.assertIn("Profiled 2 pages", summary)
+        self.assertIn("slow.md", summary)
+        self.assertNotIn("fast.md", summary)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            build.write_trace(path)
+            with open(path) as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+        names = [(event["name"], event["cat"]) for event in events]
+        expected = [
+            ("fast.md", "page"),
+            ("read", "stage"),
+            ("slow.md", "page"),
+            ("read", "stage"),
+        ]
+        self.assertEqual(names, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+import functools
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+# server.py lives at the repository root, next to src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import (  # noqa: E402
+    MANIFEST_NAME,
+    FileCache,
+    PooledHTTPServer,
+    StaticHandler,
+)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        with open(os.path.join(self.tmp.name, "index.html"), "w") as file:
+            file.write("<p>home</p>")
+        os.makedirs(os.path.join(self.tmp.name, "blog"))
+        with open(os.path.join(self.tmp.name, "blog", "post.html"), "w") as file:
+            file.write("<p>post</p>" * 1000)
+
+        handler = functools.partial(StaticHandler, directory=self.tmp.name)
+        self.server = PooledHTTPServer(("localhost", 0), handler, threads=4, backlog=8)
+        self.server.quiet = True
+        self.server.file_cache = FileCache(self.tmp.name)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+        self.port = self.server.server_address[1]
+
+    def test_keep_alive(self):
+        connection = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        self.addCleanup(connection.close)
+        for path, body in (
+            ("/index.html", b"<p>home</p>"),
+            ("/blog/post.html", b"<p>post</p>" * 1000),
+            ("/index.html", b"<p>home</p>"),
+        ):
+            connection.request("GET", path)
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), body)
+            self.assertFalse(response.will_close)
+        self.assertEqual(self.server.request_queue_size, 8)
+        cache = self.server.file_cache
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def get(self, path, headers=None):
+        # closed right away so the server doesn't wait for its next request
+        connection = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        try:
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def test_conditional_get(self):
+        response, body = self.get("/")
+        self.assertEqual(body, b"<p>home</p>")
+        etag = response.getheader("ETag")
+        self.assertEqual(etag, f'"{hashlib.sha256(body).hexdigest()}"')
+
+        response, body = self.get("/", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+        self.assertEqual(response.getheader("ETag"), etag)
+        response, _ = self.get("/", {"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+
+        last_modified = response.getheader("Last-Modified")
+        response, _ = self.get("/", {"If-Modified-Since": last_modified})
+        self.assertEqual(response.status, 304)
+        response, _ = self.get(
+            "/", {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+        )
+        self.assertEqual(response.status, 200)
+
+    def test_rewritten_file_invalidated(self):
+        self.assertEqual(self.get("/index.html")[1], b"<p>home</p>")
+        replacement = os.path.join(self.tmp.name, "new.tmp")
+        with open(replacement, "w") as file:
+            file.write("<p>changed</p>")
+        os.replace(replacement, os.path.join(self.tmp.name, "index.html"))
+        self.assertEqual(self.get("/index.html")[1], b"<p>changed</p>")
+
+    def test_etag_from_manifest(self):
+        manifest = {"pages": {"index.html": {"output": "abc123"}}}
+        with open(os.path.join(self.tmp.name, MANIFEST_NAME), "w") as file:
+            json.dump(manifest, file)
+        response, _ = self.get("/index.html")
+        self.assertEqual(response.getheader("ETag"), '"abc123"')
+
+    def test_cache_size_cap(self):
+        cache = FileCache(self.tmp.name, max_bytes=10_000)
+        self.server.file_cache = cache
+        self.get("/index.html")
+        self.get("/blog/post.html")
+        self.assertEqual(list(cache.entries), ["/index.html"])
+        self.assertLessEqual(cache.size, 10_000)
+
+    def test_precompressed_gzip(self):
+        index = os.path.join(self.tmp.name, "index.html")
+        with open(index + ".gz", "wb") as file:
+            file.write(gzip.compress(b"<p>home</p>"))
+
+        response, body = self.get("/", {"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), b"<p>home</p>")
+        gzip_etag = response.getheader("ETag")
+
+        for accept in (None, "gzip;q=0", "identity"):
+            headers = {"Accept-Encoding": accept} if accept else {}
+            response, body = self.get("/", headers)
+            self.assertIsNone(response.getheader("Content-Encoding"))
+            self.assertEqual(body, b"<p>home</p>")
+            self.assertNotEqual(response.getheader("ETag"), gzip_etag)
+
+        # an archive older than its page is ignored, also once it is cached
+        with open(index, "w") as file:
+            file.write("<p>new home</p>")
+        gzip_mtime = os.stat(index + ".gz").st_mtime_ns
+        os.utime(index, ns=(gzip_mtime + 10**9, gzip_mtime + 10**9))
+        response, body = self.get("/", {"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, b"<p>new home</p>")
+
+    def test_precompressed_gzip_uncached(self):
+        # without the cache, and for pages too big for it
+        post = os.path.join(self.tmp.name, "blog", "post.html")
+        with open(post + ".gz", "wb") as file:
+            file.write(gzip.compress(b"<p>post</p>" * 1000))
+        for cache in (None, FileCache(self.tmp.name, max_file_bytes=10)):
+            self.server.file_cache = cache
+            response, body = self.get("/blog/post.html", {"Accept-Encoding": "gzip"})
+            self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+            self.assertEqual(response.getheader("Content-Type"), "text/html")
+            self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+            self.assertEqual(gzip.decompress(body), b"<p>post</p>" * 1000)
+            response, body = self.get("/blog/post.html")
+            self.assertIsNone(response.getheader("Content-Encoding"))
+            self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+            self.assertEqual(body, b"<p>post</p>" * 1000)
+            if cache is not None:
+                self.assertEqual(list(cache.entries), [])
+
+        # directory index pages too, and an older archive is ignored
+        index = os.path.join(self.tmp.name, "index.html")
+        with open(index + ".gz", "wb") as file:
+            file.write(gzip.compress(b"<p>home</p>"))
+        response, body = self.get("/", {"Accept-Encoding": "gzip"})
+        self.assertEqual(gzip.decompress(body), b"<p>home</p>")
+        gzip_mtime = os.stat(index + ".gz").st_mtime_ns
+        os.utime(index, ns=(gzip_mtime + 10**9, gzip_mtime + 10**9))
+        response, body = self.get("/", {"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, b"<p>home</p>")
+
+        last_modified = response.getheader("Last-Modified")
+        response, _ = self.get("/", {"If-Modified-Since": last_modified})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(self.get("/blog")[0].status, 301)
+        self.assertEqual(self.get("/missing.html")[0].status, 404)
+
+    def test_idle_keep_alive_does_not_hold_workers(self):
+        # more idle keep-alive clients than the server has threads
+        for _ in range(6):
+            connection = http.client.HTTPConnection("localhost", self.port, timeout=5)
+            self.addCleanup(connection.close)
+            connection.request("GET", "/index.html")
+            response = connection.getresponse()
+            response.read()
+            self.assertFalse(response.will_close)
+        connection = http.client.HTTPConnection("localhost", self.port, timeout=1)
+        self.addCleanup(connection.close)
+        connection.request("GET", "/index.html")
+        self.assertEqual(connection.getresponse().read(), b"<p>home</p>")
+
+    def test_pipelined_requests(self):
+        client = socket.create_connection(("localhost", self.port), timeout=5)
+        self.addCleanup(client.close)
+        request = b"GET /index.html HTTP/1.1\r\nHost: localhost\r\n"
+        client.sendall(request + b"\r\n" + request + b"Connection: close\r\n\r\n")
+        received = b""
+        while chunk := client.recv(65536):
+            received += chunk
+        self.assertEqual(received.count(b"HTTP/1.1 200"), 2)
+        self.assertTrue(received.endswith(b"<p>home</p>"))
+
+    def test_idle_connection_closed_after_timeout(self):
+        self.server.idle_timeout = 0.2
+        client = socket.create_connection(("localhost", self.port), timeout=5)
+        self.addCleanup(client.close)
+        self.assertEqual(client.recv(1), b"")
+
+    def test_stalled_client_does_not_block_others(self):
+        stalled = socket.create_connection(("localhost", self.port))
+        self.addCleanup(stalled.close)
+        stalled.sendall(b"GET /index.html HTTP/1.1\r\n")
+
+        connection = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request("GET", "/blog/")
+        response = connection.getresponse()
+        # directory listings aren't regular files and skip sendfile
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"post.html", response.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
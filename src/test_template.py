@@ -0,0 +1,48 @@
+import os
+import tempfile
+import time
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template("<h1>{{ Title }}</h1>{{Content}}<p>{{  Date }}</p>")
+        expected = ["<h1>", "title", "</h1>", "content", "<p>", "date", "</p>"]
+        self.assertEqual(template.segments, expected)
+        self.assertEqual(template.names(), ["title", "content", "date"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}{{ Nav }}")
+        content = ParentNode("div", [LeafNode("b", "hi")])
+        html = template.render({"title": "Home", "content": content})
+        self.assertEqual(html, "<title>Home</title><div><b>hi</b></div>")
+
+    def test_repeated_placeholder(self):
+        template = Template("{{ Title }} - {{ Title }}")
+        self.assertEqual(template.render({"title": "a"}), "a - a")
+
+    def test_no_placeholders(self):
+        self.assertEqual(Template("plain").render({"title": "a"}), "plain")
+
+    def test_load_template_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as file:
+                file.write("{{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            with open(path, "w") as file:
+                file.write("<b>{{ Title }}</b>")
+            later = time.time() + 10
+            os.utime(path, (later, later))
+            second = load_template(path)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.render({"title": "x"}), "<b>x</b>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,6 +32,19 @@ class TestTextNode(unittest.TestCase):
             "TextNode(This is a text node, text, https://www.boot.dev)", repr(node)
         )
 
+    def test_no_instance_dict(self):
+        node = TextNode("text", text_type_text)
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.other = 1
+
+    def test_text_node_to_html_node(self):
+        node = text_node_to_html_node(TextNode("bold", text_type_bold))
+        self.assertEqual(node.to_html(), "<b>bold</b>")
+        node = text_node_to_html_node(TextNode("alt", text_type_image, "/a.png"))
+        self.assertEqual(node.props, {"src": "/a.png", "alt": "alt"})
+        self.assertRaises(ValueError, text_node_to_html_node, TextNode("x", "strike"))
+
 
 if __name__ == "__main__":
     unittest.main()
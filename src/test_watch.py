@@ -0,0 +1,173 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import main
+import watch as watch_module
+from watch import Inotify, changed_paths, snapshot, watch
+
+
+def inotify_or_skip(test, paths):
+    try:
+        source = Inotify(paths)
+    except (OSError, AttributeError) as e:
+        test.skipTest(f"inotify is unavailable: {e}")
+    test.addCleanup(source.close)
+    return source
+
+
+def read_until(source, expected, timeout=2):
+    # events may arrive in more than one batch
+    changed = set()
+    deadline = time.time() + timeout
+    while not expected <= changed and time.time() < deadline:
+        changed |= source.read(0.1)
+    return changed
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, *parts, text="text"):
+        path = os.path.join(self.tmp.name, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_snapshot_and_changes(self):
+        a = self.write("a.md")
+        b = self.write("sub", "b.md")
+        before = snapshot([self.tmp.name])
+        self.assertEqual(set(before), {a, b})
+
+        os.remove(a)
+        c = self.write("sub", "c.md")
+        self.write("sub", "b.md", text="longer text")
+        after = snapshot([self.tmp.name])
+        self.assertEqual(changed_paths(before, after), {a, b, c})
+        self.assertEqual(changed_paths(after, after), set())
+
+    def test_watch_debounces_bursts(self):
+        path = self.write("a.md")
+        calls = []
+        stop = threading.Event()
+
+        def on_change(changed):
+            calls.append(changed)
+            stop.set()
+
+        thread = threading.Thread(
+            target=watch, args=([self.tmp.name], on_change, 0.01, 0.1, stop)
+        )
+        thread.start()
+        time.sleep(0.05)
+        for i in range(3):
+            self.write("a.md", text="x" * (i + 5))
+            self.write(f"new{i}.md")
+            time.sleep(0.02)
+        thread.join(5)
+        stop.set()
+
+        new_paths = [os.path.join(self.tmp.name, f"new{i}.md") for i in range(3)]
+        expected = {path, *new_paths}
+        self.assertEqual(calls, [expected])
+
+    def test_poll_without_inotify(self):
+        path = self.write("a.md")
+        calls = []
+        stop = threading.Event()
+
+        def on_change(changed):
+            calls.append(changed)
+            stop.set()
+
+        with mock.patch.object(watch_module, "Inotify", side_effect=OSError("no")):
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                thread = threading.Thread(
+                    target=watch, args=([self.tmp.name], on_change, 0.01, 0.05, stop)
+                )
+                thread.start()
+                time.sleep(0.05)
+                self.write("a.md", text="changed")
+                thread.join(5)
+                stop.set()
+
+        self.assertEqual(calls, [{path}])
+        self.assertIn("polling", out.getvalue())
+
+    def test_inotify_follows_new_and_removed_directories(self):
+        old = self.write("old", "a.md")
+        source = inotify_or_skip(self, [self.tmp.name])
+
+        new = self.write("new", "deep", "b.md")
+        self.assertEqual(read_until(source, {new}), {new})
+        # files in the new directory are watched too
+        self.write("new", "deep", "b.md", text="changed")
+        self.assertEqual(read_until(source, {new}), {new})
+
+        os.remove(old)
+        os.rmdir(os.path.dirname(old))
+        self.assertEqual(read_until(source, {old}), {old})
+        moved = os.path.join(self.tmp.name, "elsewhere")
+        os.rename(os.path.join(self.tmp.name, "new"), moved)
+        self.assertEqual(
+            read_until(source, {new, os.path.join(moved, "deep", "b.md")}),
+            {new, os.path.join(moved, "deep", "b.md")},
+        )
+
+    def test_inotify_watched_file_replaced(self):
+        template = self.write("template.html")
+        self.write("other.html")
+        source = inotify_or_skip(self, [template])
+
+        replacement = self.write("template.html.tmp", text="new")
+        os.replace(replacement, template)
+        self.assertEqual(read_until(source, {template}), {template})
+        self.write("other.html", text="changed")
+        self.assertEqual(source.read(0.1), set())
+
+    def test_watch_site_rebuilds_changed_page(self):
+        content = os.path.join(self.tmp.name, "content")
+        static = os.path.join(self.tmp.name, "static")
+        public = os.path.join(self.tmp.name, "public")
+        template = self.write("template.html", text="{{ Content }}")
+        self.write("content", "index.md", text="# Home")
+        self.write("static", "index.css", text="body {}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.generate_pages_recursive(content, template, public)
+
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=main.watch_site,
+            args=(content, template, public, static, 1, stop),
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            thread.start()
+            time.sleep(0.1)
+            self.write("static", "index.css", text="body { margin: 0 }")
+            self.write("content", "index.md", text="# Changed")
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                with open(os.path.join(public, "index.html")) as file:
+                    if "Changed" in file.read():
+                        break
+                time.sleep(0.02)
+            stop.set()
+            thread.join(5)
+
+        with open(os.path.join(public, "index.html")) as file:
+            self.assertEqual(file.read(), "<div><h1>Changed</h1></div>")
+        with open(os.path.join(public, "index.css")) as file:
+            self.assertEqual(file.read(), "body { margin: 0 }")
+
+
+if __name__ == "__main__":
+    unittest.main()
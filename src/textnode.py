@@ -1,14 +1,26 @@
+import sys
+
 from htmlnode import LeafNode
 
-text_type_text = "text"
-text_type_bold = "bold"
-text_type_italic = "italic"
-text_type_code = "code"
-text_type_link = "link"
-text_type_image = "image"
+text_type_text = sys.intern("text")
+text_type_bold = sys.intern("bold")
+text_type_italic = sys.intern("italic")
+text_type_code = sys.intern("code")
+text_type_link = sys.intern("link")
+text_type_image = sys.intern("image")
+
+# html tag of the text types that render as a plain leaf
+_leaf_tags = {
+    text_type_text: None,
+    text_type_bold: sys.intern("b"),
+    text_type_italic: sys.intern("i"),
+    text_type_code: sys.intern("code"),
+}
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text: str, text_type: str, url: str = "") -> None:
         self.text = text
         self.text_type = text_type
@@ -26,26 +38,11 @@ class TextNode:
 
 
 def text_node_to_html_node(text_node) -> LeafNode:
-    tag = ""
-    value = text_node.text
-    props = None
-    match text_node.text_type:
-        case "text":
-            tag = None
-        case "bold":
-            tag = "b"
-        case "italic":
-            tag = "i"
-        case "code":
-            tag = "code"
-        case "link":
-            tag = "a"
-            props = {"href": text_node.url}
-        case "image":
-            tag = "img"
-            value = ""
-            props = {"src": text_node.url, "alt": text_node.text}
-        case _:
-            raise ValueError("unknown TextNode text type: ", text_node.text_type)
-
-    return LeafNode(tag, value, props)
+    text_type = text_node.text_type
+    if text_type in _leaf_tags:
+        return LeafNode(_leaf_tags[text_type], text_node.text)
+    if text_type == text_type_link:
+        return LeafNode("a", text_node.text, {"href": text_node.url})
+    if text_type == text_type_image:
+        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+    raise ValueError("unknown TextNode text type: ", text_node.text_type)
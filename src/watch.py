@@ -0,0 +1,332 @@
+import ctypes
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+
+# path -> (mtime_ns, size) of every file under the watched paths
+MtimeIndex = dict[str, tuple[int, int]]
+
+# Without inotify the tree is polled. A scan of a big tree takes a while, so
+# the wait between scans grows with it, keeping polling to roughly this share
+# of one core.
+POLL_BUSY = 0.1
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+)
+_GONE = IN_DELETE | IN_MOVED_FROM
+_event = struct.Struct("iIII")
+
+
+def snapshot(paths: list[str]) -> MtimeIndex:
+    index = {}
+    for path in paths:
+        if os.path.isdir(path):
+            _scan(path, index)
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            index[path] = (stat.st_mtime_ns, stat.st_size)
+    return index
+
+
+def _scan(dir_path: str, index: MtimeIndex) -> None:
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                _scan(entry.path, index)
+            elif entry.is_file():
+                stat = entry.stat()
+                index[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+
+def changed_paths(old: MtimeIndex, new: MtimeIndex) -> set[str]:
+    changed = {path for path, stat in new.items() if old.get(path) != stat}
+    changed.update(old.keys() - new.keys())
+    return changed
+
+
+class Inotify:
+    # Reports the files added, modified or removed under the watched paths
+    # as the kernel sees them, instead of scanning for them. Directories are
+    # watched recursively. A watched file is watched through its directory,
+    # so that replacing it with a rename is seen too. Raises OSError where
+    # inotify isn't available or the watch limit is reached.
+    def __init__(self, paths: list[str]) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise _last_error("inotify_init1")
+        self.paths = paths
+        # watch descriptor -> directory, and back
+        self.dirs: dict[int, str] = {}
+        self.wds: dict[str, int] = {}
+        # watch descriptor -> names of the files reported from it, None for
+        # every file in a directory that is watched as a whole
+        self.names: dict[int, set[str] | None] = {}
+        # directory watched as a whole -> names of the files in it, so the
+        # files of a directory that is moved away can be reported
+        self.files: dict[str, set[str]] = {}
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    self._add_tree(path, None)
+                else:
+                    self._add_file(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _add_watch(self, dir_path: str) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), _WATCH_MASK)
+        if wd < 0:
+            raise _last_error(dir_path)
+        self.dirs[wd] = dir_path
+        self.wds[dir_path] = wd
+        return wd
+
+    def _add_file(self, path: str) -> None:
+        dir_path, name = os.path.split(path)
+        wd = self._add_watch(dir_path or os.curdir)
+        if wd in self.names:
+            names = self.names[wd]
+            if names is not None:
+                names.add(name)
+        else:
+            self.names[wd] = {name}
+
+    def _add_tree(self, dir_path: str, found: set[str] | None) -> None:
+        # Watches dir_path and everything below it. The files already in a
+        # directory that appeared while watching go into found.
+        try:
+            wd = self._add_watch(dir_path)
+            entries = list(os.scandir(dir_path))
+        except FileNotFoundError:
+            # gone again before it could be watched
+            return
+        self.names[wd] = None
+        names = self.files.setdefault(dir_path, set())
+        for entry in entries:
+            if entry.is_dir():
+                self._add_tree(entry.path, found)
+            else:
+                names.add(entry.name)
+                if found is not None:
+                    found.add(entry.path)
+
+    def _drop_tree(self, dir_path: str) -> set[str]:
+        # forgets a directory that was removed or moved away and returns the
+        # files it held
+        gone = set()
+        prefix = dir_path + os.sep
+        for path in [p for p in self.files if p == dir_path or p.startswith(prefix)]:
+            gone.update(os.path.join(path, name) for name in self.files.pop(path))
+            wd = self.wds.pop(path, None)
+            if wd is not None:
+                # the watch follows a moved directory; a deleted one has
+                # already lost it, and this fails harmlessly
+                self.libc.inotify_rm_watch(self.fd, wd)
+                self.dirs.pop(wd, None)
+                self.names.pop(wd, None)
+        return gone
+
+    def _rescan(self) -> set[str]:
+        # after the kernel's event queue overflowed nothing can be trusted,
+        # so every file, before and after, counts as changed
+        changed = {
+            os.path.join(dir_path, name)
+            for dir_path, names in self.files.items()
+            for name in names
+        }
+        for wd in list(self.dirs):
+            self.libc.inotify_rm_watch(self.fd, wd)
+        self.dirs.clear()
+        self.wds.clear()
+        self.names.clear()
+        self.files.clear()
+        for path in self.paths:
+            if os.path.isdir(path):
+                self._add_tree(path, changed)
+            else:
+                self._add_file(path)
+                changed.add(path)
+        return changed
+
+    def read(self, timeout: float) -> set[str]:
+        # the paths changed since the last read, waiting up to timeout
+        # seconds for the first event
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed: set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return changed
+            self._parse(data, changed)
+
+    def _parse(self, data: bytes, changed: set[str]) -> None:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _event.unpack_from(data, offset)
+            offset += _event.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self._rescan())
+                continue
+            dir_path = self.dirs.get(wd)
+            if dir_path is None:
+                continue
+            if mask & IN_IGNORED:
+                # the directory itself was removed
+                changed.update(self._drop_tree(dir_path))
+                continue
+            if not name:
+                continue
+            path = os.path.join(dir_path, name)
+            names = self.names[wd]
+            if names is not None:
+                # the directory of a watched file
+                if name in names:
+                    changed.add(path)
+                continue
+            if mask & IN_ISDIR:
+                if mask & _GONE:
+                    changed.update(self._drop_tree(path))
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path, changed)
+                continue
+            files = self.files.setdefault(dir_path, set())
+            if mask & _GONE:
+                files.discard(name)
+            else:
+                files.add(name)
+            changed.add(path)
+
+
+def _last_error(what: str) -> OSError:
+    code = ctypes.get_errno()
+    return OSError(code, os.strerror(code), what)
+
+
+def watch(
+    paths: list[str],
+    on_change: Callable[[set[str]], None],
+    interval: float = 0.05,
+    debounce: float = 0.05,
+    stop: threading.Event | None = None,
+) -> None:
+    # Calls on_change with every file that was added, modified or removed
+    # under paths. A burst of saves is collected until the tree has been
+    # quiet for debounce seconds, so one rebuild covers it. inotify reports
+    # changes as they happen, and interval only bounds how long stopping
+    # takes; without it the tree is polled.
+    if stop is None:
+        stop = threading.Event()
+    try:
+        source = Inotify(paths)
+    except (OSError, AttributeError) as e:
+        print(f"polling for changes, inotify is unavailable: {e}")
+        poll(paths, on_change, interval, debounce, stop)
+        return
+    with source:
+        while not stop.is_set():
+            changed = source.read(interval)
+            if not changed:
+                continue
+            while not stop.is_set():
+                more = source.read(debounce)
+                if not more:
+                    break
+                changed |= more
+            if stop.is_set():
+                return
+            _notify(on_change, changed)
+
+
+def poll(
+    paths: list[str],
+    on_change: Callable[[set[str]], None],
+    interval: float = 0.05,
+    debounce: float = 0.05,
+    stop: threading.Event | None = None,
+) -> None:
+    # watch by comparing snapshots of the mtime index. The wait between two
+    # scans is at least interval, and longer for trees that take a while to
+    # scan, see POLL_BUSY.
+    if stop is None:
+        stop = threading.Event()
+    index, scan_time = _timed_snapshot(paths)
+    while not stop.wait(max(interval, scan_time * (1 / POLL_BUSY - 1))):
+        current, scan_time = _timed_snapshot(paths)
+        changed = changed_paths(index, current)
+        if not changed:
+            continue
+
+        while not stop.wait(max(debounce, scan_time * (1 / POLL_BUSY - 1))):
+            settled, scan_time = _timed_snapshot(paths)
+            more = changed_paths(current, settled)
+            if not more:
+                break
+            changed |= more
+            current = settled
+        if stop.is_set():
+            return
+
+        index = current
+        _notify(on_change, changed)
+
+
+def _timed_snapshot(paths: list[str]) -> tuple[MtimeIndex, float]:
+    start = time.perf_counter()
+    index = snapshot(paths)
+    return index, time.perf_counter() - start
+
+
+def _notify(on_change: Callable[[set[str]], None], changed: set[str]) -> None:
+    try:
+        on_change(changed)
+    except Exception as e:
+        # a half-written file shouldn't end the watch, the next save
+        # triggers another rebuild
+        print(f"rebuild failed: {e}")